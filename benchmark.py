@@ -0,0 +1,138 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from game import Game
+from scripts.assets import BASE_MSC_PATH, get_level_list
+from scripts.levelfile import binary_path, read_level, write_level
+
+SUBSYSTEMS = ["tilemap render", "entity update", "particles", "stats hud"]
+COLUMNS = SUBSYSTEMS + ["other"]
+
+
+class Timings:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = dict.fromkeys(SUBSYSTEMS, 0)
+        self.active = 0
+
+    def wrap(self, subsystem, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            self.seconds[subsystem] += time.perf_counter() - start
+            return result
+
+        return timed
+
+
+def scripted_input(game, tick):
+    # run right and jump every half second; turn around for a second every five seconds
+    game.movement = [tick % 300 >= 240, tick % 300 < 240]
+    if tick % 30 == 0:
+        game.player.jump()
+
+
+def instrument(game, timings):
+    game.tilemap.render = timings.wrap("tilemap render", game.tilemap.render)
+    for method in ["update_fruits", "update_projectiles", "update_enemies", "update_player"]:
+        setattr(game, method, timings.wrap("entity update", getattr(game, method)))
+    game.particles.update = timings.wrap("particles", game.particles.update)
+    game.render_particles = timings.wrap("particles", game.render_particles)
+    game.render_stats = timings.wrap("stats hud", game.render_stats)
+
+
+def run(ticks, render=True):
+    game = Game(headless=True)
+    timings = Timings()
+    instrument(game, timings)
+
+    print(f"{'level':<8}{'ticks/s':>10}{'active':>8}" + "".join(f"{column + ' ms':>20}" for column in COLUMNS))
+    for level in range(len(game.levels)):
+        game.level = level
+        game.load_level()
+        timings.reset()
+
+        start = time.perf_counter()
+        for tick in range(ticks):
+            # keep the scripted player from running out of lives (which would restart at level 0)
+            game.player.lives = 3
+            scripted_input(game, tick)
+            game.update()
+            timings.active += game.active["enemies"]
+            if render:
+                game.render()
+        duration = time.perf_counter() - start
+        timings.seconds["other"] = duration - sum(timings.seconds.values())
+
+        print(
+            f"{os.path.basename(game.levels[level]):<8}{ticks / duration:>10.0f}{timings.active / ticks:>8.1f}"
+            + "".join(f"{timings.seconds[column] * 1000 / ticks:>20.3f}" for column in COLUMNS)
+        )
+
+
+def run_load(repeat):
+    print(f"{'level':<8}{'json ms':>10}{'binary ms':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for level in get_level_list():
+            binary = os.path.join(directory, os.path.basename(binary_path(level)))
+            write_level(binary, read_level(level))
+
+            durations = []
+            for path in [level, binary]:
+                start = time.perf_counter()
+                for i in range(repeat):
+                    read_level(path)
+                durations.append((time.perf_counter() - start) * 1000 / repeat)
+
+            print(f"{os.path.basename(level):<8}{durations[0]:>10.2f}{durations[1]:>12.2f}")
+
+
+def measure_music(variant):
+    # runs in a fresh process, so the resident memory is not influenced by other measurements
+    import resource
+
+    import pygame
+
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.mixer.init()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if variant == "sound":
+        pygame.mixer.Sound(BASE_MSC_PATH + "epic-battle-153400.mp3")
+    else:
+        pygame.mixer.music.load(BASE_MSC_PATH + "epic-battle-153400.mp3")
+    duration = time.perf_counter() - start
+    print(duration * 1000, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024)
+
+
+def run_music():
+    print(f"{'music':<24}{'load ms':>10}{'memory MB':>12}")
+    for variant, name in [("sound", "decoded (mixer.Sound)"), ("stream", "streamed (mixer.music)")]:
+        result = subprocess.run([sys.executable, __file__, "--music-variant", variant], capture_output=True, text=True, check=True)
+        duration, memory = map(float, result.stdout.split()[-2:])
+        print(f"{name:<24}{duration:>10.1f}{memory:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulation throughput benchmark (headless)")
+    parser.add_argument("--ticks", type=int, default=5000, help="simulation ticks per level")
+    parser.add_argument("--no-render", action="store_true", help="only run the simulation")
+    parser.add_argument("--load", action="store_true", help="compare load times of json and binary levels instead")
+    parser.add_argument("--repeat", type=int, default=20, help="loads per level and format (with --load)")
+    parser.add_argument("--music", action="store_true", help="compare load time and memory of decoded and streamed music instead")
+    parser.add_argument("--music-variant", choices=["sound", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.music_variant:
+        measure_music(args.music_variant)
+    elif args.music:
+        run_music()
+    elif args.load:
+        run_load(args.repeat)
+    else:
+        run(args.ticks, render=not args.no_render)
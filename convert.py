@@ -0,0 +1,13 @@
+import sys
+
+from scripts.levelfile import BINARY_EXTENSION, binary_path, read_level, write_level
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python convert.py data/levels/NN.json [...] (to binary) | data/levels/NN.lvl [...] (to json)")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        target = path[: -len(BINARY_EXTENSION)] + ".json" if path.endswith(BINARY_EXTENSION) else binary_path(path)
+        write_level(target, read_level(path))
+        print(path, "->", target)
@@ -3,6 +3,7 @@ import pygame
 import pygame.gfxdraw
 
 from scripts.assets import load_tile_assets
+from scripts.presenter import Presenter
 from scripts.tilemap import Tilemap
 
 INITIAL_DISPLAY_SIZE = [800, 500]
@@ -15,9 +16,8 @@ class Editor:
 
         # display
         pygame.init()
-        pygame.display.set_caption("Level Editor")
-        self.screen = pygame.display.set_mode(INITIAL_DISPLAY_SIZE, pygame.RESIZABLE)
-        self.display = pygame.Surface(INITIAL_DISPLAY_SIZE)
+        self.presenter = Presenter("Level Editor", INITIAL_DISPLAY_SIZE)
+        self.display = self.presenter.resize(INITIAL_DISPLAY_SIZE, INITIAL_DISPLAY_SIZE)
         self.display_scale = 1
         self.clock = pygame.Clock()
         self.font = pygame.Font("data/fonts/press-start-2p-latin-400-normal.ttf", 16)
@@ -45,10 +45,9 @@ class Editor:
     def calc_size(self):
         p0 = [0, 0]
         p1 = [0, 0]
-        for tile_loc in self.tilemap.tiles:
-            tile = self.tilemap.tiles[tile_loc]
-            p0 = [min(p0[0], tile["pos"][0]), min(p0[1], tile["pos"][1])]
-            p1 = [max(p1[0], tile["pos"][0]), max(p1[1], tile["pos"][1])]
+        for x, y, t_type, variant in self.tilemap.tiles:
+            p0 = [min(p0[0], x), min(p0[1], y)]
+            p1 = [max(p1[0], x), max(p1[1], y)]
         self.size = [p1[0] - p0[0], p1[1] - p0[1]]
 
     def run(self):
@@ -79,20 +78,15 @@ class Editor:
 
             self.display.blit(self.font.render(f"{self.size[0]}x{self.size[1]}", False, (255, 255, 255)), (8, 8))
 
-            self.screen.fill((0, 0, 0, 0))
-            self.screen.blit(
-                pygame.transform.scale(self.display, (self.display.get_width() / self.display_scale, self.display.get_height() / self.display_scale)), (0, 0)
-            )
-            pygame.display.update()
+            self.presenter.present(self.display)
 
             # user inputs
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+                # the sdl2 presenter keeps a hidden window open, so closing the visible one doesn't quit by itself
+                if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
                     running = False
-                if event.type == pygame.VIDEORESIZE:
-                    self.resize(event.dict["size"])
-                if event.type == pygame.VIDEOEXPOSE:
-                    self.resize(self.screen.get_size())
+                if event.type in (pygame.WINDOWSIZECHANGED, pygame.VIDEOEXPOSE):
+                    self.resize(self.presenter.window_size())
                 if event.type == pygame.KEYDOWN:
                     if event.key in (pygame.K_LEFT, pygame.K_a):
                         self.movement[0] = True
@@ -110,6 +104,8 @@ class Editor:
                         self.tilemap.save(self.level_file)
                     if event.key == pygame.K_t:
                         self.tilemap.autotile()
+                    if event.key == pygame.K_r:
+                        self.tilemap.auto_tile = not self.tilemap.auto_tile
                 if event.type == pygame.KEYUP:
                     if event.key in (pygame.K_LEFT, pygame.K_a):
                         self.movement[0] = False
@@ -145,7 +141,7 @@ class Editor:
     def resize(self, size):
         # fixed height, variable width
         self.display_scale = INITIAL_DISPLAY_SIZE[1] / size[1]
-        self.display = pygame.Surface((size[0] * self.display_scale, INITIAL_DISPLAY_SIZE[1]))
+        self.display = self.presenter.resize(size, (size[0] * self.display_scale, INITIAL_DISPLAY_SIZE[1]))
 
     def update_tile(self, increment=1, variant=False):
         if variant:
@@ -1,13 +1,23 @@
-import random
+import os
+import time
 import pygame
 import pygame.gfxdraw
 
+from scripts import rng
 from scripts.clouds import Clouds
-from scripts.entities import Bee, Bunny, Chicken, Entity, Fruit, Pig, Player, Snail
+from scripts.entities import Bee, Bunny, Checkpoint, Chicken, Pig, Player, Snail
+from scripts.fruits import Fruits
+from scripts.hud import Hud
+from scripts.inputs import JUMP, LEFT, RECORD_PATH, RESIZE, RIGHT, TOGGLE_AUDIO, InputRecorder, InputReplay
 from scripts.particles import Leaf, Particles
+from scripts.preloader import LevelPreloader
+from scripts.presenter import RENDERER, Presenter
+from scripts.profiler import FlightRecorder, Profiler
+from scripts.spatial import SpatialHash
 from scripts.tilemap import Tilemap
+from scripts.transition import IrisWipe
 from scripts.assets import (
-    LEAF_SPAWN_RECTS,
+    CLOCK,
     get_level_list,
     load_animated_assets,
     load_image,
@@ -20,32 +30,70 @@ from scripts.assets import (
 )
 
 INITIAL_DISPLAY_SIZE = [800, 500]
+# simulation steps per second
 FPS = 60
+# rendered frames per second (0 = uncapped)
+RENDER_FPS = 0
+MAX_STEPS_PER_FRAME = 5
+# enemies further than this (in pixels) outside the viewport are not updated
+ACTIVITY_MARGIN = 128
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, render_fps=RENDER_FPS, headless=False, activity_margin=ACTIVITY_MARGIN, seed=rng.SEED, record=RECORD_PATH, replay=None):
+        # replays restore the random seed and the display size of their recording
+        self.replay = InputReplay(replay) if replay else None
+        window_size = INITIAL_DISPLAY_SIZE
+        if self.replay:
+            seed = self.replay.seed
+            window_size = self.replay.display_size
+        elif record and seed is None:
+            seed = rng.new_seed()
+        if seed is not None:
+            rng.seed(seed)
+
         # display
+        self.headless = headless
+        if headless:
+            # no window and no audio device, e.g. for benchmarks
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+            render_fps = 0
         pygame.init()
         pygame.mouse.set_visible(False)
-        pygame.display.set_caption("Jump 'n' Run")
-        self.screen = pygame.display.set_mode(INITIAL_DISPLAY_SIZE, pygame.RESIZABLE)
-        self.display = pygame.Surface(INITIAL_DISPLAY_SIZE)
-        self.display_scale = 1
+        self.presenter = Presenter("Jump 'n' Run", window_size, "software" if headless else RENDERER)
         self.clock = pygame.Clock()
+        self.render_fps = render_fps
+
+        # level transitions
+        self.iris_wipe = IrisWipe()
+        self.display_scale = 1
+        self.resize_display(window_size, window_size)
 
         # background
         self.bg_surface = pygame.Surface((0, 0))
 
         # topbar (stats)
-        self.stats_surface = pygame.Surface((self.display.get_width() - 16, 80), pygame.SRCALPHA)
-        self.stats_images = load_images("stats")
         self.font = pygame.Font(resource_path("data/fonts/press-start-2p-latin-400-normal.ttf"), 16)
+        self.hud = Hud(self.font, load_images("stats"), load_images("muted"))
+
+        # frame time profiler (toggle the overlay with F3)
+        self.profiler = Profiler(pygame.Font(resource_path("data/fonts/press-start-2p-latin-400-normal.ttf"), 8))
+        # dumps frame time spikes and captures cProfile stats (F4)
+        self.recorder = FlightRecorder()
 
         # user inputs & derived states
         self.movement = [False, False]
+        # jumps and audio toggles until the next simulation step
+        self.pending_inputs = 0
+        self.input_recorder = InputRecorder(record, seed, self.display.get_size()) if record and not self.replay else None
         self.scroll = [0, 0]
+        self.last_scroll = [0, 0]
         self.render_offset = (0, 0)
+        self.alpha = 1
+        # blits onto the display by the last render call (surfaces composed in advance, like tilemap chunks,
+        # the background and the HUD, count once; drawing calls like sparks and the iris circle not at all)
+        self.blit_count = 0
 
         # assets
         self.tile_assets = load_tile_assets()
@@ -53,21 +101,26 @@ class Game:
         self.projectile_assets = load_projectile_assets()
         self.mountains = load_image("mountains.png")
         self.clouds = Clouds(load_images("clouds"), count=16)
-        self.muted_icons = load_images("muted")
-        self.music = load_music()
+        self.music_loaded = False
         self.sounds = load_sounds()
         self.levels = get_level_list()
         self.tilemap = Tilemap(self.tile_assets)
+        self.preloader = LevelPreloader()
 
         # entities
-        self.start = Entity(self, "start", (0, 0), (64, 64), (-32, -48))
-        self.end = Entity(self, "end", (0, 0), (64, 64), (-16, -48))
+        self.start = Checkpoint(self, "start", (0, 0), (64, 64), (-32, -48))
+        self.end = Checkpoint(self, "end", (0, 0), (64, 64), (-16, -48))
         self.player = Player(self, pos=(0, 0))
         self.enemies = []
         self.particles = Particles()
         self.projectiles = []
         self.leaf_spawners = []
-        self.fruits = {}
+        self.fruits = Fruits(self)
+        # spatial hash for collisions of the player with enemies and projectiles (rebuilt every step)
+        self.entity_hash = SpatialHash(64)
+        # entities outside the activity region sleep until they re-enter it
+        self.activity_margin = activity_margin
+        self.active = {"enemies": 0}
 
         # game states
         self.rerender_background = True
@@ -90,43 +143,36 @@ class Game:
         self.time = 300 * FPS
         self.reached_level_end = False
 
-        self.tilemap.load(self.levels[self.level])
+        level = self.preloader.get(self.levels[self.level])
+        self.tilemap.load_data(level["level"])
         self.enemies = []
-        self.leaf_spawners = []
-        self.spawn_fruits()
-        self.spawn_entities()
-
-        for tree in self.tilemap.extract(
-            [("decor/trees", 0), ("decor/trees", 1), ("decor/trees", 2), ("decor/trees", 3), ("decor/trees", 4), ("decor/trees", 5)], keep=True
-        ):
-            self.leaf_spawners.append(
-                pygame.Rect(
-                    tree["pos"][0] + LEAF_SPAWN_RECTS[tree["variant"]].x,
-                    tree["pos"][1] + LEAF_SPAWN_RECTS[tree["variant"]].y,
-                    LEAF_SPAWN_RECTS[tree["variant"]].width,
-                    LEAF_SPAWN_RECTS[tree["variant"]].height,
-                )
-            )
+        self.spawn_fruits(level["surface_tiles"])
+        self.spawn_entities(level["spawners"])
+        self.leaf_spawners = level["leaf_spawners"]
         self.player.spawn(self.start.pos)
 
+        # prepare the current level (for restarts) and the next one in the background
+        self.preloader.preload(self.levels[self.level])
+        self.preloader.preload(self.levels[(self.level + 1) % len(self.levels)])
+
     def toggle_audio(self):
         self.muted = not self.muted
         if self.muted:
-            self.music.stop()
+            pygame.mixer.music.stop()
         else:
-            self.music.set_volume(0.25)
-            self.music.play(-1)
-
-    def spawn_fruits(self):
-        self.fruits = {}
-        surface_tiles = self.tilemap.find_surface_tiles()
-        for pos in random.sample(surface_tiles, int(len(surface_tiles) // 8)):
-            self.fruits[str(pos[0]) + ";" + str(pos[1])] = Fruit(self, (pos[0] * self.tilemap.tile_size, pos[1] * self.tilemap.tile_size))
-
-    def spawn_entities(self):
-        for spawner in self.tilemap.extract(
-            [("spawners", 0), ("spawners", 1), ("spawners", 2), ("spawners", 3), ("spawners", 4), ("spawners", 5), ("spawners", 6)]
-        ):
+            # the game starts muted, so the music is only loaded once it is needed
+            if not self.music_loaded:
+                load_music()
+                self.music_loaded = True
+            pygame.mixer.music.play(-1)
+
+    def spawn_fruits(self, surface_tiles):
+        self.fruits.clear()
+        for pos in rng.FRUITS.sample(surface_tiles, int(len(surface_tiles) // 8)):
+            self.fruits.add(pos)
+
+    def spawn_entities(self, spawners):
+        for spawner in spawners:
             if spawner["type"] == "spawners":
                 if spawner["variant"] == 0:
                     self.start.pos = spawner["pos"]
@@ -145,169 +191,251 @@ class Game:
 
     def spawn_leafs(self):
         for rect in self.leaf_spawners:
-            if random.random() * 499999 < rect.width * rect.height:
-                pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
+            if rng.LEAFS.random() * 499999 < rect.width * rect.height:
+                pos = (rect.x + rng.LEAFS.random() * rect.width, rect.y + rng.LEAFS.random() * rect.height)
                 self.particles.add(Leaf(pos, self.animated_assets["particles/leaf"]))
 
     def run(self):
         running = True
-        while running:
-            # camera position centered on player
-            self.scroll[0] += self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]
-            self.scroll[1] += self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]
-            self.render_offset = (int(self.scroll[0]), int(self.scroll[1]))
-
-            # level transitions
-            if self.player.died:
-                self.player.died += 1
-                if self.player.died >= 10:
-                    self.transition = min(30, self.transition + 1)
-                if self.player.died > 40:
-                    if self.player.lives <= 0:
-                        self.reset()
-                    else:
-                        self.load_level()
-            elif self.reached_level_end:
-                self.transition += 1
-                if self.transition > 30:
-                    self.level = (self.level + 1) % len(self.levels)
-                    self.load_level()
-            elif self.player.rect().colliderect(self.end.rect()):
-                self.reached_level_end = True
-            elif self.level > 0:
-                self.time -= 1
-                if self.time <= 0:
-                    self.player.die()
-
-            if self.transition < 0:
-                self.transition += 1
-
-            self.spawn_leafs()
-
-            # render display & update objects
-            self.display.fill((0, 0, 0, 0))
-            self.render_background()
-            self.tilemap.render(self.display, self.render_offset)
-            self.render_checkpoints()
-            self.render_fruits()
-            self.render_particles()
-            self.render_projectiles()
-            self.render_enemies()
-            self.render_player()
-            self.render_stats()
-            self.render_transition()
-
-            # render display to screen
-            self.screen.fill((0, 0, 0, 0))
-            self.screen.blit(
-                pygame.transform.scale(self.display, (self.display.get_width() / self.display_scale, self.display.get_height() / self.display_scale)), (0, 0)
-            )
-            pygame.display.update()
+        accumulator = 0
+        last_frame = time.perf_counter()
+        while running and not (self.replay and self.replay.done):
+            self.profiler.begin_frame()
 
             # user inputs
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+                # the sdl2 presenter keeps a hidden window open, so closing the visible one doesn't quit by itself
+                if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
                     running = False
-                if event.type == pygame.VIDEORESIZE:
-                    self.resize(event.dict["size"])
-                if event.type == pygame.VIDEOEXPOSE:
-                    self.resize(self.screen.get_size())
+                if event.type in (pygame.WINDOWSIZECHANGED, pygame.VIDEOEXPOSE):
+                    self.resize(self.presenter.window_size())
                 if event.type == pygame.KEYDOWN:
                     if event.key in (pygame.K_LEFT, pygame.K_a):
                         self.movement[0] = True
                     if event.key in (pygame.K_RIGHT, pygame.K_d):
                         self.movement[1] = True
                     if event.key in (pygame.K_UP, pygame.K_w, pygame.K_SPACE):
-                        self.player.jump()
+                        self.pending_inputs |= JUMP
                     if event.key == pygame.K_m:
-                        self.toggle_audio()
+                        self.pending_inputs |= TOGGLE_AUDIO
+                    if event.key == pygame.K_F3:
+                        self.profiler.toggle()
+                    if event.key == pygame.K_F4:
+                        self.recorder.arm_profile(start=self.profiler.frame)
                 if event.type == pygame.KEYUP:
                     if event.key in (pygame.K_LEFT, pygame.K_a):
                         self.movement[0] = False
                     if event.key in (pygame.K_RIGHT, pygame.K_d):
                         self.movement[1] = False
+            self.profiler.mark("events")
+
+            # advance the simulation in fixed steps of 1 / FPS seconds, independent of the render rate
+            self.clock.tick(self.render_fps)
+            self.profiler.mark("wait")
+            now = time.perf_counter()
+            accumulator += now - last_frame
+            last_frame = now
+            steps = 0
+            while accumulator >= 1 / FPS and not (self.replay and self.replay.done):
+                self.update()
+                accumulator -= 1 / FPS
+                steps += 1
+                if steps >= MAX_STEPS_PER_FRAME:
+                    # drop the remaining time instead of spiraling into ever longer frames
+                    accumulator = 0
+            self.profiler.mark("update")
+
+            # render display & interpolate between the last two simulation steps
+            self.render(accumulator * FPS)
+            self.profiler.render(self.display)
+            self.profiler.mark("overlay")
 
-            self.clock.tick(FPS)
+            # render display to screen
+            self.presenter.present(self.display)
+            self.profiler.mark("present")
+            self.profiler.end_frame(self.counts())
+            self.recorder.record(self.profiler)
+
+        self.recorder.close()
+        if self.input_recorder:
+            self.input_recorder.save()
+
+    def update_inputs(self):
+        # inputs are applied (and recorded or replayed) once per simulation step
+        inputs = self.movement[0] * LEFT | self.movement[1] * RIGHT | self.pending_inputs
+        self.pending_inputs = 0
+        if self.replay:
+            inputs = self.replay.next()
+            self.movement = [bool(inputs & LEFT), bool(inputs & RIGHT)]
+            if inputs & RESIZE:
+                self.resize_display(self.presenter.window_size(), self.replay.display_size)
+        if self.input_recorder:
+            self.input_recorder.record(inputs, self.display.get_size())
+
+        if inputs & JUMP:
+            self.player.jump()
+        if inputs & TOGGLE_AUDIO:
+            self.toggle_audio()
+
+    def update(self):
+        self.update_inputs()
+
+        # camera position centered on player
+        self.last_scroll = self.scroll.copy()
+        self.scroll[0] += self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]
+        self.scroll[1] += self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]
+
+        # level transitions
+        if self.player.died:
+            self.player.died += 1
+            if self.player.died >= 10:
+                self.transition = min(30, self.transition + 1)
+            if self.player.died > 40:
+                if self.player.lives <= 0:
+                    self.reset()
+                else:
+                    self.load_level()
+        elif self.reached_level_end:
+            self.transition += 1
+            if self.transition > 30:
+                self.level = (self.level + 1) % len(self.levels)
+                self.load_level()
+        elif self.player.rect().colliderect(self.end.rect()):
+            self.reached_level_end = True
+        elif self.level > 0:
+            self.time -= 1
+            if self.time <= 0:
+                self.player.die()
+
+        if self.transition < 0:
+            self.transition += 1
+
+        self.spawn_leafs()
+
+        # update objects
+        self.clouds.update()
+        self.update_fruits()
+        self.particles.update()
+        self.update_projectiles()
+        self.update_enemies()
+        self.update_entity_hash()
+        self.update_player()
+
+        # fruits, checkpoints and leaves are animated by the shared clock
+        CLOCK.tick()
+
+    def render(self, alpha=1):
+        self.alpha = alpha
+        self.render_offset = (
+            int(self.last_scroll[0] + (self.scroll[0] - self.last_scroll[0]) * alpha),
+            int(self.last_scroll[1] + (self.scroll[1] - self.last_scroll[1]) * alpha),
+        )
+
+        # the render helpers return the number of their blits onto the display
+        self.display.fill((0, 0, 0, 0))
+        self.blit_count = self.render_background()
+        self.profiler.mark("background")
+        self.tilemap.render(self.display, self.render_offset)
+        self.blit_count += self.tilemap.blit_count
+        self.profiler.mark("tilemap")
+        self.blit_count += self.render_checkpoints()
+        self.profiler.mark("checkpoints")
+        self.blit_count += self.render_fruits()
+        self.profiler.mark("fruits")
+        self.blit_count += self.render_particles()
+        self.profiler.mark("particles")
+        self.blit_count += self.render_projectiles()
+        self.profiler.mark("projectiles")
+        self.blit_count += self.render_enemies()
+        self.profiler.mark("enemies")
+        self.blit_count += self.render_player()
+        self.profiler.mark("player")
+        self.blit_count += self.render_stats()
+        self.profiler.mark("stats")
+        self.blit_count += self.render_transition()
+        self.profiler.mark("transition")
+
+    def counts(self):
+        return {
+            "enemies": len(self.enemies),
+            "active": self.active["enemies"],
+            "projectiles": len(self.projectiles),
+            "fruits": len(self.fruits),
+            "particles": len(self.particles),
+            "blits": self.blit_count,
+        }
 
     def render_transition(self):
         if self.transition:
-            transition_surface = pygame.Surface(self.display.get_size())
-            pygame.draw.circle(
-                transition_surface,
-                (255, 255, 255),
-                (self.display.get_width() // 2, self.display.get_height() // 2),
-                (30 - abs(self.transition)) * self.tilemap.tile_size,
-            )
-            transition_surface.set_colorkey((255, 255, 255))
-            self.display.blit(transition_surface, (0, 0))
+            return self.iris_wipe.render(self.display, (30 - abs(self.transition)) * self.tilemap.tile_size)
+        return 0
 
     def render_checkpoints(self):
-        self.start.update()
-        self.start.render(self.display, self.render_offset)
-        self.end.update()
-        self.end.render(self.display, self.render_offset)
+        return self.start.render(self.display, self.render_offset) + self.end.render(self.display, self.render_offset)
+
+    def activity_rect(self):
+        return pygame.Rect(self.scroll[0], self.scroll[1], self.display.get_width(), self.display.get_height()).inflate(
+            self.activity_margin * 2, self.activity_margin * 2
+        )
+
+    def update_fruits(self):
+        for fruit in self.fruits.collide(self.player.rect()):
+            fruit.collect()
+            self.fruits.remove(fruit)
 
     def render_fruits(self):
-        for fruit in self.fruits.copy():
-            if self.fruits[fruit].update():
-                del self.fruits[fruit]
-            else:
-                self.fruits[fruit].render(self.display, self.render_offset)
+        self.fruits.render(self.display, self.render_offset)
+        return self.fruits.blit_count
 
-    def render_player(self):
+    def update_player(self):
         if not self.player.died:
             self.player.update(movement=(self.movement[1] - self.movement[0], 0), tilemap=self.tilemap)
-            self.player.render(self.display, self.render_offset)
+
+    def render_player(self):
+        if not self.player.died:
+            return self.player.render(self.display, self.render_offset, self.alpha)
+        return 0
 
     def render_particles(self):
-        self.particles.update()
         self.particles.render(self.display, self.render_offset)
+        return self.particles.blit_count
 
-    def render_enemies(self):
+    def update_enemies(self):
+        active = self.activity_rect()
+        self.active["enemies"] = 0
         for enemy in self.enemies.copy():
+            if not active.colliderect(enemy.rect()):
+                continue
+            self.active["enemies"] += 1
             if enemy.update(self.tilemap):
                 self.enemies.remove(enemy)
-            else:
-                enemy.render(self.display, self.render_offset)
 
-    def render_projectiles(self):
+    def update_entity_hash(self):
+        self.entity_hash.clear()
+        for enemy in self.enemies:
+            self.entity_hash.insert(enemy, enemy.rect())
+        for projectile in self.projectiles:
+            self.entity_hash.insert(projectile, projectile.rect())
+
+    def render_enemies(self):
+        blits = 0
+        for enemy in self.enemies:
+            blits += enemy.render(self.display, self.render_offset, self.alpha)
+        return blits
+
+    def update_projectiles(self):
         for projectile in self.projectiles.copy():
             if projectile.update(self.tilemap):
                 self.projectiles.remove(projectile)
-            else:
-                projectile.render(self.display, self.render_offset)
+
+    def render_projectiles(self):
+        blits = 0
+        for projectile in self.projectiles:
+            blits += projectile.render(self.display, self.render_offset, self.alpha)
+        return blits
 
     def render_stats(self):
-        if self.stats_surface.get_width() != self.display.get_width() - 16:
-            self.stats_surface = pygame.Surface((self.display.get_width() - 16, 80), pygame.SRCALPHA)
-
-        self.stats_surface.fill((0, 0, 0, 0))
-        # lives
-        self.stats_surface.blit(self.stats_images[0], (0, 0))
-        self.stats_surface.blit(self.font.render(str(self.player.lives), False, (255, 255, 255)), (20, 0))
-        # fruits
-        self.stats_surface.blit(self.stats_images[1], (80, 0))
-        self.stats_surface.blit(self.font.render(str(self.player.fruits).zfill(2), False, (255, 255, 255)), (100, 0))
-        # level
-        self.stats_surface.blit(self.font.render(f"L{str(self.level).zfill(2)}", False, (255, 255, 255)), (176, 0))
-        # muted
-        self.stats_surface.blit(self.muted_icons[self.muted], (256, 0))
-        # time
-        time = self.font.render(str(self.time // FPS), False, (255, 255, 255))
-        self.stats_surface.blit(time, (self.stats_surface.get_width() - time.get_width(), 0))
-
-        if self.level == 0:
-            text_keys = self.font.render("Use arrow keys or [w,a,s,d] to move.", False, (255, 255, 255))
-            self.stats_surface.blit(text_keys, ((self.stats_surface.get_width() - text_keys.get_width()) // 2, 40))
-            text_start = self.font.render("Start game by touching the flag.", False, (255, 255, 255))
-            self.stats_surface.blit(text_start, ((self.stats_surface.get_width() - text_start.get_width()) // 2, 64))
-
-        stats_mask = pygame.mask.from_surface(self.stats_surface)
-        stats_mask = stats_mask.convolve(pygame.Mask((3, 3), fill=True))
-        silhouette = stats_mask.to_surface(setcolor=(0, 0, 33), unsetcolor=(0, 0, 0, 0))
-        self.display.blit(silhouette, (7, 7))
-
-        self.display.blit(self.stats_surface, (8, 8))
+        return self.hud.render(self.display, self.player.lives, self.player.fruits, self.level, self.muted, self.time // FPS)
 
     def render_background(self):
         if self.rerender_background or self.bg_surface.get_width() != self.display.get_width():
@@ -329,13 +457,20 @@ class Game:
             )
 
         self.display.blit(self.bg_surface, (0, 0))
-        self.clouds.update()
-        self.clouds.draw(self.display, self.render_offset)
+        return 1 + self.clouds.draw(self.display, self.render_offset)
 
     def resize(self, size):
+        if self.replay:
+            # replays keep the display size of their recording, a new window size only changes how it is presented
+            self.resize_display(size, self.display.get_size())
+            return
         # fixed height, variable width
         self.display_scale = INITIAL_DISPLAY_SIZE[1] / size[1]
-        self.display = pygame.Surface((size[0] * self.display_scale, INITIAL_DISPLAY_SIZE[1]))
+        self.resize_display(size, (size[0] * self.display_scale, INITIAL_DISPLAY_SIZE[1]))
+
+    def resize_display(self, window_size, display_size):
+        self.display = self.presenter.resize(window_size, display_size)
+        self.iris_wipe.resize(self.display.get_size())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+import argparse
+
+from game import Game
+from scripts.profiler import STAGES, Profiler, percentile
+
+
+def replay(path, headless=True):
+    game = Game(headless=headless, replay=path)
+    # keep the timings of all frames instead of the last ones only
+    game.profiler = Profiler(game.profiler.font, frames=None)
+    game.run()
+
+    profiler = game.profiler
+    print(f"{'stage':<12}{'avg ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, times in [("frame", profiler.frame_times)] + [(stage, profiler.stage_times[stage]) for stage in STAGES]:
+        print(f"{stage:<12}{sum(times) / len(times) * 1000:>10.3f}{percentile(times, 0.95) * 1000:>10.3f}{percentile(times, 0.99) * 1000:>10.3f}")
+    # the final state should be the same for every replay of a recording
+    print(
+        f"{game.replay.tick} ticks, {profiler.frame} frames;"
+        + f" level {game.level}, lives {game.player.lives}, fruits {game.player.fruits}, player at {game.player.pos[0]:.1f}, {game.player.pos[1]:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded playthrough (see JNR_RECORD) and report frame times")
+    parser.add_argument("recording", help="input recording")
+    parser.add_argument("--window", action="store_true", help="show the replay in a window instead of running headless")
+    args = parser.parse_args()
+    replay(args.recording, headless=not args.window)
@@ -1,6 +1,14 @@
 import os
+import struct
 import sys
+import tempfile
+import threading
+import zlib
+from collections.abc import Mapping
+from functools import partial
+
 import pygame
+from scripts.atlas import Atlas
 
 
 def resource_path(relative_path):
@@ -15,6 +23,26 @@ BASE_IMG_PATH = resource_path("./data/images/")
 BASE_SND_PATH = resource_path("./data/sounds/")
 BASE_MSC_PATH = resource_path("./data/music/")
 
+# directory for decoded images (disabled if not set); the cache files are keyed by the content of the source images
+ASSET_CACHE_PATH = os.environ.get("JNR_ASSET_CACHE")
+CACHE_MAGIC = b"JNRI"
+CACHE_ENTRY = struct.Struct("<2IHH")
+
+# images loaded with load_images end up in shared atlas pages
+ATLAS = Atlas()
+
+
+class AnimationClock:
+    # frame counter of all shared animations; advanced once per simulation step (see Game.update)
+    def __init__(self):
+        self.frame = 0
+
+    def tick(self):
+        self.frame += 1
+
+
+CLOCK = AnimationClock()
+
 LEAF_SPAWN_RECTS = [
     pygame.Rect(15, 15, 44, 38),
     pygame.Rect(20, 18, 52, 52),
@@ -26,15 +54,21 @@ LEAF_SPAWN_RECTS = [
 
 
 class Animation:
-    def __init__(self, images, image_duration=5, loop=True):
+    def __init__(self, images, image_duration=5, loop=True, flipped_images=None):
         self.images = images
+        # horizontally flipped frames are rendered once and shared by all copies
+        self.flipped_images = flipped_images or [ATLAS.add(pygame.transform.flip(image, True, False)) for image in images]
         self.image_duration = image_duration
         self.loop = loop
         self.done = False
         self.frame = 0
 
     def copy(self):
-        return Animation(self.images, self.image_duration, self.loop)
+        return Animation(self.images, self.image_duration, self.loop, self.flipped_images)
+
+    def share(self):
+        # looping animations without state of their own can run on the shared clock instead
+        return SharedAnimation(self.images, self.image_duration, self.flipped_images)
 
     def update(self):
         if self.loop:
@@ -44,73 +78,183 @@ class Animation:
             if self.frame >= self.image_duration * len(self.images) - 1:
                 self.done = True
 
-    def image(self):
+    def image(self, flip=False):
+        if flip:
+            return self.flipped_images[int(self.frame / self.image_duration)]
         return self.images[int(self.frame / self.image_duration)]
 
 
+class SharedAnimation(Animation):
+    # looping animation driven by CLOCK; only the phase (offset to the clock) is stored per copy,
+    # so there is nothing to update per entity
+    def __init__(self, images, image_duration=5, flipped_images=None):
+        super().__init__(images, image_duration, True, flipped_images)
+
+    @property
+    def frame(self):
+        return (CLOCK.frame + self.phase) % (self.image_duration * len(self.images))
+
+    @frame.setter
+    def frame(self, frame):
+        self.phase = frame - CLOCK.frame
+
+    def copy(self):
+        return self.share()
+
+    def update(self):
+        pass
+
+
+class LazyAssets(Mapping):
+    # assets are loaded on first access (thread-safe) and kept from then on
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key not in self.loaded:
+            with self.lock:
+                if key not in self.loaded:
+                    self.loaded[key] = self.loaders[key]()
+        return self.loaded[key]
+
+    def __contains__(self, key):
+        return key in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
+
+
 def load_image(path):
     image = pygame.image.load(BASE_IMG_PATH + path).convert_alpha()
     return image
 
 
 def load_images(path):
+    files = [path + "/" + file for file in sorted(os.listdir(BASE_IMG_PATH + path)) if str(file).endswith((".png"))]
+    if not ASSET_CACHE_PATH:
+        return [ATLAS.add(load_image(file)) for file in files]
+
+    keys = []
+    for file in files:
+        f = open(BASE_IMG_PATH + file, "rb")
+        source = f.read()
+        f.close()
+        keys.append((len(source), zlib.crc32(source)))
+
+    cache_file = os.path.join(ASSET_CACHE_PATH, path.replace("/", "_") + ".bin")
+    images = read_image_cache(cache_file, keys)
+    if images is None:
+        images = [load_image(file) for file in files]
+        write_image_cache(cache_file, keys, images)
+    return [ATLAS.add(image) for image in images]
+
+
+def read_image_cache(cache_file, keys):
+    try:
+        f = open(cache_file, "rb")
+        data = f.read()
+        f.close()
+    except OSError:
+        return None
+    # stale, truncated or otherwise broken cache files are ignored (the images are decoded again)
+    offset = 8 + len(keys) * CACHE_ENTRY.size
+    if len(data) < offset or data[:4] != CACHE_MAGIC or struct.unpack_from("<I", data, 4)[0] != len(keys):
+        return None
+
     images = []
-    for file in sorted(os.listdir(BASE_IMG_PATH + path)):
-        if str(file).endswith((".png")):
-            images.append(load_image(path + "/" + file))
+    for i, key in enumerate(keys):
+        size, crc, width, height = CACHE_ENTRY.unpack_from(data, 8 + i * CACHE_ENTRY.size)
+        if (size, crc) != key or len(data) < offset + width * height * 4:
+            return None
+        images.append(pygame.image.frombytes(data[offset : offset + width * height * 4], (width, height), "RGBA").convert_alpha())
+        offset += width * height * 4
     return images
 
 
+def write_image_cache(cache_file, keys, images):
+    chunks = [CACHE_MAGIC, struct.pack("<I", len(keys))]
+    for key, image in zip(keys, images):
+        chunks.append(CACHE_ENTRY.pack(key[0], key[1], image.get_width(), image.get_height()))
+    for image in images:
+        chunks.append(pygame.image.tobytes(image, "RGBA"))
+    temp_file = None
+    try:
+        os.makedirs(ASSET_CACHE_PATH, exist_ok=True)
+        # written to a temporary file first, so an interrupted write never leaves a partial cache file behind
+        fd, temp_file = tempfile.mkstemp(dir=ASSET_CACHE_PATH)
+        f = os.fdopen(fd, "wb")
+        f.write(b"".join(chunks))
+        f.close()
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # the cache is optional
+        if temp_file and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
 def load_tile_assets():
-    return {
-        "tiles/candy": load_images("tiles/candy"),
-        "tiles/grass": load_images("tiles/grass"),
-        "tiles/ice": load_images("tiles/ice"),
-        "tiles/mud": load_images("tiles/mud"),
-        "tiles/sand": load_images("tiles/sand"),
-        "tiles/stone": load_images("tiles/stone"),
-        "tiles/swamp": load_images("tiles/swamp"),
-        "tiles/wall": load_images("tiles/wall"),
-        "caves/stone": load_images("caves/stone"),
-        "decor/frames": load_images("decor/frames"),
-        "decor/trees": load_images("decor/trees"),
-        "decor/bushes": load_images("decor/bushes"),
-        "decor/flowers": load_images("decor/flowers"),
-        "spawners": load_images("spawners"),
-        "backgrounds": load_images("backgrounds"),
-    }
+    return LazyAssets(
+        {
+            "tiles/candy": partial(load_images, "tiles/candy"),
+            "tiles/grass": partial(load_images, "tiles/grass"),
+            "tiles/ice": partial(load_images, "tiles/ice"),
+            "tiles/mud": partial(load_images, "tiles/mud"),
+            "tiles/sand": partial(load_images, "tiles/sand"),
+            "tiles/stone": partial(load_images, "tiles/stone"),
+            "tiles/swamp": partial(load_images, "tiles/swamp"),
+            "tiles/wall": partial(load_images, "tiles/wall"),
+            "caves/stone": partial(load_images, "caves/stone"),
+            "decor/frames": partial(load_images, "decor/frames"),
+            "decor/trees": partial(load_images, "decor/trees"),
+            "decor/bushes": partial(load_images, "decor/bushes"),
+            "decor/flowers": partial(load_images, "decor/flowers"),
+            "spawners": partial(load_images, "spawners"),
+            "backgrounds": partial(load_images, "backgrounds"),
+        }
+    )
+
+
+def load_animation(path, image_duration=5, loop=True):
+    return Animation(load_images(path), image_duration, loop)
 
 
 def load_animated_assets():
-    return {
-        "start/idle": Animation(load_images("checkpoints/start/idle"), image_duration=4),
-        "end/idle": Animation(load_images("checkpoints/end/idle"), image_duration=4),
-        "player/idle": Animation(load_images("entities/player/idle"), image_duration=6),
-        "player/run": Animation(load_images("entities/player/run"), image_duration=4),
-        "player/jump": Animation(load_images("entities/player/jump")),
-        "player/fall": Animation(load_images("entities/player/fall")),
-        "player/wall-slide": Animation(load_images("entities/player/wall-slide")),
-        "player/wall-jump": Animation(load_images("entities/player/wall-jump"), image_duration=4),
-        "pig/idle": Animation(load_images("entities/pig/idle"), image_duration=6),
-        "pig/run": Animation(load_images("entities/pig/run"), image_duration=4),
-        "snail/idle": Animation(load_images("entities/snail/idle"), image_duration=6),
-        "snail/run": Animation(load_images("entities/snail/run"), image_duration=4),
-        "bee/idle": Animation(load_images("entities/bee/idle"), image_duration=6),
-        "bee/attack": Animation(load_images("entities/bee/attack"), image_duration=4),
-        "chicken/idle": Animation(load_images("entities/chicken/idle"), image_duration=6),
-        "chicken/run": Animation(load_images("entities/chicken/run"), image_duration=2),
-        "bunny/idle": Animation(load_images("entities/bunny/idle"), image_duration=6),
-        "bunny/run": Animation(load_images("entities/bunny/run"), image_duration=4),
-        "fruits/apple/idle": Animation(load_images("fruits/apple/idle"), image_duration=4),
-        "fruits/bananas/idle": Animation(load_images("fruits/bananas/idle"), image_duration=4),
-        "fruits/cherries/idle": Animation(load_images("fruits/cherries/idle"), image_duration=4),
-        "fruits/kiwi/idle": Animation(load_images("fruits/kiwi/idle"), image_duration=4),
-        "fruits/melon/idle": Animation(load_images("fruits/melon/idle"), image_duration=4),
-        "fruits/orange/idle": Animation(load_images("fruits/orange/idle"), image_duration=4),
-        "fruits/pineapple/idle": Animation(load_images("fruits/pineapple/idle"), image_duration=4),
-        "fruits/strawberry/idle": Animation(load_images("fruits/strawberry/idle"), image_duration=4),
-        "particles/leaf": Animation(load_images("particles/leaf"), image_duration=12),
-    }
+    return LazyAssets(
+        {
+            "start/idle": partial(load_animation, "checkpoints/start/idle", image_duration=4),
+            "end/idle": partial(load_animation, "checkpoints/end/idle", image_duration=4),
+            "player/idle": partial(load_animation, "entities/player/idle", image_duration=6),
+            "player/run": partial(load_animation, "entities/player/run", image_duration=4),
+            "player/jump": partial(load_animation, "entities/player/jump"),
+            "player/fall": partial(load_animation, "entities/player/fall"),
+            "player/wall-slide": partial(load_animation, "entities/player/wall-slide"),
+            "player/wall-jump": partial(load_animation, "entities/player/wall-jump", image_duration=4),
+            "pig/idle": partial(load_animation, "entities/pig/idle", image_duration=6),
+            "pig/run": partial(load_animation, "entities/pig/run", image_duration=4),
+            "snail/idle": partial(load_animation, "entities/snail/idle", image_duration=6),
+            "snail/run": partial(load_animation, "entities/snail/run", image_duration=4),
+            "bee/idle": partial(load_animation, "entities/bee/idle", image_duration=6),
+            "bee/attack": partial(load_animation, "entities/bee/attack", image_duration=4),
+            "chicken/idle": partial(load_animation, "entities/chicken/idle", image_duration=6),
+            "chicken/run": partial(load_animation, "entities/chicken/run", image_duration=2),
+            "bunny/idle": partial(load_animation, "entities/bunny/idle", image_duration=6),
+            "bunny/run": partial(load_animation, "entities/bunny/run", image_duration=4),
+            "fruits/apple/idle": partial(load_animation, "fruits/apple/idle", image_duration=4),
+            "fruits/bananas/idle": partial(load_animation, "fruits/bananas/idle", image_duration=4),
+            "fruits/cherries/idle": partial(load_animation, "fruits/cherries/idle", image_duration=4),
+            "fruits/kiwi/idle": partial(load_animation, "fruits/kiwi/idle", image_duration=4),
+            "fruits/melon/idle": partial(load_animation, "fruits/melon/idle", image_duration=4),
+            "fruits/orange/idle": partial(load_animation, "fruits/orange/idle", image_duration=4),
+            "fruits/pineapple/idle": partial(load_animation, "fruits/pineapple/idle", image_duration=4),
+            "fruits/strawberry/idle": partial(load_animation, "fruits/strawberry/idle", image_duration=4),
+            "particles/leaf": partial(load_animation, "particles/leaf", image_duration=12),
+        }
+    )
 
 
 def load_projectile_assets():
@@ -118,23 +262,34 @@ def load_projectile_assets():
 
 
 def load_music():
-    return pygame.mixer.Sound(BASE_MSC_PATH + "epic-battle-153400.mp3")
+    # music is streamed from the file instead of being decoded into memory as a whole
+    pygame.mixer.music.load(BASE_MSC_PATH + "epic-battle-153400.mp3")
+    pygame.mixer.music.set_volume(0.25)
+
+
+def load_sound(file):
+    return pygame.mixer.Sound(BASE_SND_PATH + file)
 
 
 def load_sounds():
-    return {
-        "1up": pygame.mixer.Sound(BASE_SND_PATH + "1up.wav"),
-        "death": pygame.mixer.Sound(BASE_SND_PATH + "death.wav"),
-        "fruit": pygame.mixer.Sound(BASE_SND_PATH + "fruit.wav"),
-        "jump": pygame.mixer.Sound(BASE_SND_PATH + "jump.wav"),
-        "kill": pygame.mixer.Sound(BASE_SND_PATH + "kill.wav"),
-        "shoot": pygame.mixer.Sound(BASE_SND_PATH + "shoot.wav"),
-    }
+    return LazyAssets(
+        {
+            "1up": partial(load_sound, "1up.wav"),
+            "death": partial(load_sound, "death.wav"),
+            "fruit": partial(load_sound, "fruit.wav"),
+            "jump": partial(load_sound, "jump.wav"),
+            "kill": partial(load_sound, "kill.wav"),
+            "shoot": partial(load_sound, "shoot.wav"),
+        }
+    )
 
 
 def get_level_list():
+    # levels may be stored as json and / or binary (.lvl) files; Tilemap.load picks the right one
     levels = []
     for file in sorted(os.listdir(resource_path("data/levels"))):
         if str(file).endswith((".json")):
             levels.append(resource_path("data/levels/" + file))
+        elif str(file).endswith((".lvl")) and not os.path.exists(resource_path("data/levels/" + file[:-4] + ".json")):
+            levels.append(resource_path("data/levels/" + file))
     return levels
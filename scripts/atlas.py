@@ -0,0 +1,37 @@
+import pygame
+
+
+class Atlas:
+    # packs images into a few large pages (row by row) and hands out subsurfaces of those pages
+    def __init__(self, page_size=1024, padding=1):
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []
+        self.x = 0
+        self.y = 0
+        self.row_height = 0
+
+    def add(self, image: pygame.Surface):
+        width, height = image.get_size()
+        if width > self.page_size or height > self.page_size:
+            return image
+
+        if self.x + width > self.page_size:
+            # start a new row
+            self.x = 0
+            self.y += self.row_height + self.padding
+            self.row_height = 0
+        if not self.pages or self.y + height > self.page_size:
+            # start a new page
+            self.pages.append(pygame.Surface((self.page_size, self.page_size), pygame.SRCALPHA).convert_alpha())
+            self.pages[-1].fill((0, 0, 0, 0))
+            self.x = 0
+            self.y = 0
+            self.row_height = 0
+
+        # the page is empty (transparent black) at this spot, so max blending copies pixels and alpha unchanged
+        self.pages[-1].blit(image, (self.x, self.y), special_flags=pygame.BLEND_RGBA_MAX)
+        sprite = self.pages[-1].subsurface((self.x, self.y, width, height))
+        self.x += width + self.padding
+        self.row_height = max(self.row_height, height)
+        return sprite
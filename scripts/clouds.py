@@ -1,4 +1,4 @@
-import random
+from scripts import rng
 
 
 class Cloud:
@@ -25,6 +25,7 @@ class Cloud:
                 - self.img.get_height(),
             ),
         )
+        return 1
 
 
 class Clouds:
@@ -34,10 +35,10 @@ class Clouds:
         for i in range(count):
             self.clouds.append(
                 Cloud(
-                    (random.random() * 99999, random.random() * 99999),
-                    random.choice(cloud_images),
-                    random.random() * 0.05 + 0.05,
-                    random.random() * 0.6 + 0.2,
+                    (rng.CLOUDS.random() * 99999, rng.CLOUDS.random() * 99999),
+                    rng.CLOUDS.choice(cloud_images),
+                    rng.CLOUDS.random() * 0.05 + 0.05,
+                    rng.CLOUDS.random() * 0.6 + 0.2,
                 )
             )
 
@@ -48,5 +49,8 @@ class Clouds:
             cloud.update()
 
     def draw(self, surface, offset=(0, 0)):
+        # returns the number of blits onto surface
+        blits = 0
         for cloud in self.clouds:
-            cloud.draw(surface, offset)
+            blits += cloud.draw(surface, offset)
+        return blits
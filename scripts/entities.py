@@ -1,8 +1,9 @@
 import math
-import random
 import pygame
+from scripts import rng
 from scripts.particles import Bubble, Dust, Spark
 from scripts.projectile import Projectile
+from scripts.tilegrid import ICE, SWAMP
 from scripts.tilemap import Tilemap
 
 
@@ -11,6 +12,7 @@ class Entity:
         self.game = game
         self.type = e_type
         self.pos = list(pos)
+        self.last_pos = None
         self.size = list(size)
         self.animation_offset = list(animation_offset)
         self.flip = False
@@ -28,18 +30,38 @@ class Entity:
     def update(self):
         self.animation.update()
 
-    def render(self, surface: pygame.Surface, offset=(0, 0)):
+    def render_pos(self, alpha=1):
+        # interpolated position between the last two simulation steps
+        if self.last_pos is None:
+            return self.pos
+        return (
+            self.last_pos[0] + (self.pos[0] - self.last_pos[0]) * alpha,
+            self.last_pos[1] + (self.pos[1] - self.last_pos[1]) * alpha,
+        )
+
+    def render(self, surface: pygame.Surface, offset=(0, 0), alpha=1):
+        pos = self.render_pos(alpha)
         surface.blit(
-            pygame.transform.flip(self.animation.image(), self.flip, False),
+            self.animation.image(self.flip),
             (
-                self.pos[0] - offset[0] + self.animation_offset[0],
-                self.pos[1] - offset[1] + self.animation_offset[1],
+                pos[0] - offset[0] + self.animation_offset[0],
+                pos[1] - offset[1] + self.animation_offset[1],
             ),
         )
+        # number of blits onto surface
+        return 1
 
     def animate_death(self):
         for i in range(30):
-            self.game.particles.add(Spark(self.rect().center, random.random() * math.pi * 2, 2 + random.random()))
+            self.game.particles.add(Spark(self.rect().center, rng.PARTICLES.random() * math.pi * 2, 2 + rng.PARTICLES.random()))
+
+
+class Checkpoint(Entity):
+    def set_action(self, action):
+        # checkpoints only loop their idle animation, which runs on the shared clock
+        if self.action != action:
+            self.action = action
+            self.animation = self.game.animated_assets[self.type + "/" + self.action].share()
 
 
 class Fruit(Entity):
@@ -48,22 +70,24 @@ class Fruit(Entity):
     def __init__(self, game, pos):
         super().__init__(
             game,
-            "fruits/" + random.sample(Fruit.TYPES, 1)[0],
+            "fruits/" + rng.FRUITS.sample(Fruit.TYPES, 1)[0],
             pos,
             (16, 16),
             (-8, -8),
         )
 
-    def update(self):
-        super().update()
+    def set_action(self, action):
+        # fruits of the same type share their animation (see Fruits)
+        if self.action != action:
+            self.action = action
+            self.animation = self.game.fruits.animation(self.type + "/" + self.action)
 
-        if self.rect().colliderect(self.game.player.rect()):
-            self.game.player.collect_fruit()
-            for i in range(20):
-                self.game.particles.add(Bubble(pos=(int(self.pos[0] + self.size[0] / 2), int(self.pos[1] + self.size[1] / 2))))
-            if not self.game.muted:
-                self.game.sounds["fruit"].play()
-            return True
+    def collect(self):
+        self.game.player.collect_fruit()
+        for i in range(20):
+            self.game.particles.add(Bubble(pos=(int(self.pos[0] + self.size[0] / 2), int(self.pos[1] + self.size[1] / 2))))
+        if not self.game.muted:
+            self.game.sounds["fruit"].play()
 
 
 class PhysicsEntity(Entity):
@@ -74,10 +98,11 @@ class PhysicsEntity(Entity):
         self.last_movement = [0, 0]
 
     def update(self, tilemap: Tilemap, movement=(0, 0)):
+        self.last_pos = self.pos.copy()
         rect = self.rect()
-        surface_tile = tilemap.solid_check((rect.centerx, rect.bottom + tilemap.tile_size // 2))
-        on_ice = surface_tile and surface_tile["type"] == "tiles/ice"
-        on_swamp = surface_tile and surface_tile["type"] == "tiles/swamp"
+        surface = tilemap.solid_check((rect.centerx, rect.bottom + tilemap.tile_size // 2))
+        on_ice = surface == ICE
+        on_swamp = surface == SWAMP
 
         frame_movement = (
             movement[0] * (0.5 if on_swamp else 1) + self.velocity[0],
@@ -151,6 +176,7 @@ class Player(PhysicsEntity):
 
     def spawn(self, pos=(0, 0)):
         self.pos = list(pos)
+        self.last_pos = None
         self.air_time = 0
         self.jumps = 1
         self.wall_slide = False
@@ -212,18 +238,22 @@ class Player(PhysicsEntity):
 
         super().update(tilemap, movement=(movement[0] * self.speed, movement[1]))
 
-        # collisions with enemies
+        # collisions with enemies and projectiles (only those close to the player)
         p_rect = self.rect()
-        for enemy in self.game.enemies.copy():
-            e_rect = enemy.rect()
-            if p_rect.colliderect(e_rect):
-                if p_rect.centery < e_rect.centery:
-                    enemy.animate_death()
-                    self.game.enemies.remove(enemy)
-                    if not self.game.muted:
-                        self.game.sounds["kill"].play()
-                else:
+        for entity in self.game.entity_hash.query(p_rect):
+            if isinstance(entity, Projectile):
+                if p_rect.collidepoint(entity.pos):
                     self.die()
+                    self.game.projectiles.remove(entity)
+                continue
+            e_rect = entity.rect()
+            if p_rect.centery < e_rect.centery:
+                entity.animate_death()
+                self.game.enemies.remove(entity)
+                if not self.game.muted:
+                    self.game.sounds["kill"].play()
+            else:
+                self.die()
 
     def jump(self):
         if self.wall_slide:
@@ -281,8 +311,8 @@ class RunningEnemy(PhysicsEntity):
                 self.flip = not self.flip
             else:
                 movement = (movement[0] + (-self.speed if self.flip else self.speed), movement[1])
-        elif random.random() < 0.01:
-            self.moving = random.randint(120, 480)
+        elif rng.ENEMIES.random() < 0.01:
+            self.moving = rng.ENEMIES.randint(120, 480)
             self.set_action("run")
         else:
             self.set_action("idle")
@@ -300,10 +330,7 @@ class Pig(RunningEnemy):
         tiles = 6
         do_rush = False
         if abs(dy) < self.size[1] and abs(dx) < tiles * self.size[0] and ((dx > 0 and not self.flip) or (dx < 0 and self.flip)):
-            do_rush = True
-            for i in range(tiles):
-                if tilemap.solid_check((self.pos[0] + i * (dx / tiles), self.pos[1])):
-                    do_rush = False
+            do_rush = tilemap.line_of_sight(self.pos, (self.pos[0] + dx, self.pos[1]), tiles)
 
         if do_rush:
             self.moving += 1
@@ -339,10 +366,7 @@ class Snail(RunningEnemy):
             tiles = 12
             do_shoot = False
             if abs(dy) < self.size[1] and abs(dx) < tiles * self.size[0] and ((dx > 0 and not self.flip) or (dx < 0 and self.flip)):
-                do_shoot = True
-                for i in range(tiles):
-                    if tilemap.solid_check((self.pos[0] + i * (dx / tiles), self.pos[1])):
-                        do_shoot = False
+                do_shoot = tilemap.line_of_sight(self.pos, (self.pos[0] + dx, self.pos[1]), tiles)
                 if do_shoot:
                     self.shooting = 240
                     self.set_action("idle")
@@ -368,7 +392,7 @@ class Bee(PhysicsEntity):
             if self.attacking == 120 + 0:
                 self.set_action("idle")
         else:
-            if random.random() < 0.01:
+            if rng.ENEMIES.random() < 0.01:
                 self.attacking = 120 + 64
                 self.set_action("attack")
 
@@ -395,7 +419,7 @@ class Bunny(RunningEnemy):
         if (
             self.moving
             and self.collisions["down"]
-            and random.random() < 0.1
+            and rng.ENEMIES.random() < 0.1
             and tilemap.solid_check((self.rect().centerx + (-2.5 if self.flip else 2.5) * tilemap.tile_size, self.rect().bottom + tilemap.tile_size // 2))
         ):
             self.velocity[1] = -2
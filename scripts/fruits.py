@@ -0,0 +1,59 @@
+import pygame
+from scripts.entities import Fruit
+
+
+class Fruits:
+    # fruits sit on the tile grid, so they are stored by tile cell (at most one fruit per cell)
+    def __init__(self, game):
+        self.game = game
+        self.cells = {}
+        # all fruits of a type share one animation on the shared clock
+        self.animations = {}
+        # number of fruits drawn by the last render call
+        self.blit_count = 0
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells.values())
+
+    def clear(self):
+        self.cells = {}
+        self.animations = {}
+
+    def animation(self, key):
+        if key not in self.animations:
+            self.animations[key] = self.game.animated_assets[key].share()
+        return self.animations[key]
+
+    def add(self, tile_pos):
+        tile_size = self.game.tilemap.tile_size
+        self.cells[tuple(tile_pos)] = Fruit(self.game, (tile_pos[0] * tile_size, tile_pos[1] * tile_size))
+
+    def remove(self, fruit):
+        tile_size = self.game.tilemap.tile_size
+        self.cells.pop((int(fruit.pos[0] // tile_size), int(fruit.pos[1] // tile_size)), None)
+
+    def collide(self, rect: pygame.Rect):
+        # only the few cells overlapped by rect are checked
+        tile_size = self.game.tilemap.tile_size
+        fruits = []
+        for x in range(rect.left // tile_size, (rect.right - 1) // tile_size + 1):
+            for y in range(rect.top // tile_size, (rect.bottom - 1) // tile_size + 1):
+                if (x, y) in self.cells:
+                    fruits.append(self.cells[(x, y)])
+        return fruits
+
+    def render(self, surface: pygame.Surface, offset=(0, 0)):
+        # only render fruits in (or one tile around) the viewport
+        tile_size = self.game.tilemap.tile_size
+        left, top = offset[0] // tile_size - 1, offset[1] // tile_size - 1
+        right, bottom = (offset[0] + surface.get_width()) // tile_size + 1, (offset[1] + surface.get_height()) // tile_size + 1
+        blits = [
+            (fruit.animation.image(), (fruit.pos[0] - offset[0] + fruit.animation_offset[0], fruit.pos[1] - offset[1] + fruit.animation_offset[1]))
+            for (x, y), fruit in self.cells.items()
+            if left <= x <= right and top <= y <= bottom
+        ]
+        self.blit_count = len(blits)
+        surface.blits(blits, doreturn=False)
@@ -0,0 +1,55 @@
+import pygame
+
+
+class Hud:
+    def __init__(self, font: pygame.Font, stats_images, muted_icons):
+        self.font = font
+        self.stats_images = stats_images
+        self.muted_icons = muted_icons
+        self.texts = {}
+        self.state = None
+        self.surface = pygame.Surface((0, 0), pygame.SRCALPHA)
+
+    def text(self, field, text):
+        # texts are only rendered again when their field changes
+        if field not in self.texts or self.texts[field][0] != text:
+            self.texts[field] = (text, self.font.render(text, False, (255, 255, 255)))
+        return self.texts[field][1]
+
+    def render(self, surface: pygame.Surface, lives, fruits, level, muted, seconds):
+        state = (surface.get_width(), lives, fruits, level, muted, seconds)
+        if state != self.state:
+            self.state = state
+            self.surface = self.compose(surface.get_width() - 16, lives, fruits, level, muted, seconds)
+        surface.blit(self.surface, (7, 7))
+        # number of blits onto surface
+        return 1
+
+    def compose(self, width, lives, fruits, level, muted, seconds):
+        stats_surface = pygame.Surface((width, 80), pygame.SRCALPHA)
+        # lives
+        stats_surface.blit(self.stats_images[0], (0, 0))
+        stats_surface.blit(self.text("lives", str(lives)), (20, 0))
+        # fruits
+        stats_surface.blit(self.stats_images[1], (80, 0))
+        stats_surface.blit(self.text("fruits", str(fruits).zfill(2)), (100, 0))
+        # level
+        stats_surface.blit(self.text("level", f"L{str(level).zfill(2)}"), (176, 0))
+        # muted
+        stats_surface.blit(self.muted_icons[muted], (256, 0))
+        # time
+        time = self.text("time", str(seconds))
+        stats_surface.blit(time, (stats_surface.get_width() - time.get_width(), 0))
+
+        if level == 0:
+            text_keys = self.text("keys", "Use arrow keys or [w,a,s,d] to move.")
+            stats_surface.blit(text_keys, ((stats_surface.get_width() - text_keys.get_width()) // 2, 40))
+            text_start = self.text("start", "Start game by touching the flag.")
+            stats_surface.blit(text_start, ((stats_surface.get_width() - text_start.get_width()) // 2, 64))
+
+        # outline the stats with a dark silhouette
+        stats_mask = pygame.mask.from_surface(stats_surface)
+        stats_mask = stats_mask.convolve(pygame.Mask((3, 3), fill=True))
+        composite = stats_mask.to_surface(setcolor=(0, 0, 33), unsetcolor=(0, 0, 0, 0))
+        composite.blit(stats_surface, (1, 1))
+        return composite
@@ -0,0 +1,76 @@
+import os
+import struct
+
+# Input recordings (all numbers little-endian):
+#   header  magic "JNRR", version (u16), seed (i64), display width, height (u16 each)
+#   inputs  one byte per simulation step, combining the flags below; steps with RESIZE set are followed
+#           by the new display width and height (u16 each)
+# The simulation depends on the display size (camera, activity region), so its changes are part of the inputs.
+MAGIC = b"JNRR"
+VERSION = 2
+HEADER = struct.Struct("<4sHq2H")
+SIZE = struct.Struct("<2H")
+
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+TOGGLE_AUDIO = 8
+RESIZE = 16
+
+# file to record the inputs of a game to (disabled if not set)
+RECORD_PATH = os.environ.get("JNR_RECORD")
+
+
+class InputRecorder:
+    def __init__(self, path, seed, display_size):
+        self.path = path
+        self.seed = seed
+        self.initial_display_size = display_size
+        self.display_size = display_size
+        self.inputs = bytearray()
+        self.ticks = 0
+
+    def record(self, inputs, display_size):
+        self.ticks += 1
+        if display_size != self.display_size:
+            self.display_size = display_size
+            self.inputs.append(inputs | RESIZE)
+            self.inputs += SIZE.pack(display_size[0], display_size[1])
+        else:
+            self.inputs.append(inputs)
+
+    def save(self):
+        f = open(self.path, "wb")
+        f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.initial_display_size[0], self.initial_display_size[1]))
+        f.write(self.inputs)
+        f.close()
+
+
+class InputReplay:
+    def __init__(self, path):
+        f = open(path, "rb")
+        data = f.read()
+        f.close()
+        magic, version, self.seed, width, height = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not an input recording (version " + str(VERSION) + "): " + path)
+        self.display_size = (width, height)
+        self.inputs = data[HEADER.size :]
+        self.offset = 0
+        self.tick = 0
+
+    @property
+    def done(self):
+        return self.offset >= len(self.inputs)
+
+    def next(self):
+        # inputs of the next simulation step (none once the recording has ended); display_size is updated with RESIZE
+        if self.done:
+            return 0
+        inputs = self.inputs[self.offset]
+        self.offset += 1
+        self.tick += 1
+        if inputs & RESIZE:
+            self.display_size = SIZE.unpack_from(self.inputs, self.offset)
+            self.offset += SIZE.size
+        return inputs
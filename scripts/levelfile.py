@@ -0,0 +1,115 @@
+import json
+import mmap
+import os
+import struct
+
+from scripts.tilegrid import TileGrid
+
+# Binary levels (all numbers little-endian):
+#   header   magic "JNRL", version, tile size, background, number of types (u16 each)
+#   types    for each type: length (u8) + utf-8 name; type id n refers to the n-th name (starting at 1)
+#   tiles    x, y (i32), width, height (u32) of the dense grid, then width * height type ids and
+#            width * height variants (u8 each), then the number of sparse tiles (u32) and one
+#            (x, y (i32), type id, variant (u8)) record per sparse tile
+#   offgrid  number of offgrid tiles (u32) and one (type id, variant (u8), x, y (f64)) record per tile
+BINARY_EXTENSION = ".lvl"
+MAGIC = b"JNRL"
+VERSION = 1
+
+HEADER = struct.Struct("<4s4H")
+GRID = struct.Struct("<2i2I")
+COUNT = struct.Struct("<I")
+SPARSE_TILE = struct.Struct("<2i2B")
+OFFGRID_TILE = struct.Struct("<2B2d")
+
+
+def binary_path(path):
+    return os.path.splitext(path)[0] + BINARY_EXTENSION
+
+
+def preferred_path(path):
+    # use the binary version of a level if it exists and is at least as new as the json file
+    binary = binary_path(path)
+    if path != binary and os.path.exists(binary):
+        if not os.path.exists(path) or os.path.getmtime(binary) >= os.path.getmtime(path):
+            return binary
+    return path
+
+
+def read_level(path):
+    if path.endswith(BINARY_EXTENSION):
+        return read_binary(path)
+    f = open(path, "r")
+    data = json.load(f)
+    f.close()
+    data["tiles"] = TileGrid.from_dict(data["tiles"])
+    return data
+
+
+def write_level(path, data):
+    if path.endswith(BINARY_EXTENSION):
+        return write_binary(path, data)
+    f = open(path, "w")
+    json.dump({"background": data["background"], "tile_size": data["tile_size"], "tiles": data["tiles"].to_dict(), "offgrid": data["offgrid"]}, f)
+    f.close()
+
+
+def read_binary(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        magic, version, tile_size, background, type_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a level file (version " + str(VERSION) + "): " + path)
+        offset = HEADER.size
+
+        grid = TileGrid()
+        for i in range(type_count):
+            length = buffer[offset]
+            grid.type_id(buffer[offset + 1 : offset + 1 + length].decode("utf-8"))
+            offset += 1 + length
+
+        x, y, width, height = GRID.unpack_from(buffer, offset)
+        offset += GRID.size
+        grid.allocate(x, y, width, height)
+        grid.type_grid[:] = buffer[offset : offset + width * height]
+        grid.variant_grid[:] = buffer[offset + width * height : offset + 2 * width * height]
+        grid.material_grid[:] = grid.type_grid.translate(bytes(grid.materials + [0] * (256 - len(grid.materials))))
+        offset += 2 * width * height
+
+        (sparse_count,) = COUNT.unpack_from(buffer, offset)
+        offset += COUNT.size
+        for x, y, type_id, variant in SPARSE_TILE.iter_unpack(buffer[offset : offset + sparse_count * SPARSE_TILE.size]):
+            grid.sparse[(x, y)] = (type_id, variant)
+        offset += sparse_count * SPARSE_TILE.size
+
+        (offgrid_count,) = COUNT.unpack_from(buffer, offset)
+        offset += COUNT.size
+        offgrid = []
+        for type_id, variant, x, y in OFFGRID_TILE.iter_unpack(buffer[offset : offset + offgrid_count * OFFGRID_TILE.size]):
+            offgrid.append({"type": grid.types[type_id], "variant": variant, "pos": [x, y]})
+
+    return {"background": background, "tile_size": tile_size, "tiles": grid, "offgrid": offgrid}
+
+
+def write_binary(path, data):
+    grid = data["tiles"]
+    # offgrid tiles may use types that do not occur on the grid
+    for tile in data["offgrid"]:
+        grid.type_id(tile["type"])
+
+    chunks = [HEADER.pack(MAGIC, VERSION, data["tile_size"], data["background"], len(grid.types) - 1)]
+    for t_type in grid.types[1:]:
+        name = t_type.encode("utf-8")
+        chunks.append(bytes([len(name)]) + name)
+    chunks.append(GRID.pack(grid.x, grid.y, grid.width, grid.height))
+    chunks.append(bytes(grid.type_grid))
+    chunks.append(bytes(grid.variant_grid))
+    chunks.append(COUNT.pack(len(grid.sparse)))
+    for (x, y), (type_id, variant) in grid.sparse.items():
+        chunks.append(SPARSE_TILE.pack(x, y, type_id, variant))
+    chunks.append(COUNT.pack(len(data["offgrid"])))
+    for tile in data["offgrid"]:
+        chunks.append(OFFGRID_TILE.pack(grid.type_ids[tile["type"]], tile["variant"], tile["pos"][0], tile["pos"][1]))
+
+    f = open(path, "wb")
+    f.write(b"".join(chunks))
+    f.close()
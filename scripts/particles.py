@@ -1,122 +1,195 @@
 import math
-import random
+from functools import cache
+from itertools import compress
 
 import pygame
-from scripts.assets import Animation
+from scripts import rng
+from scripts.assets import CLOCK, Animation
 
+# Particle classes only describe a particle when it is spawned; Particles copies their FIELDS into
+# one pool per class, which stores every field in its own list and updates / renders a whole pool at once.
 
-class Dust:
-    def __init__(self, pos):
-        self.pos = list(pos)
-        self.ttl = random.randint(5, 15)
-        self.radius = int(random.random() * 6)
-        self.image = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, (192, 192, 192), (self.radius, self.radius), self.radius)
 
-    def update(self):
-        self.ttl -= 1
-        return not self.ttl
-
-    def render(self, surface: pygame.Surface, offset=(0, 0)):
-        surface.blit(self.image, (self.pos[0] - offset[0], self.pos[1] - offset[1] - self.radius))
+@cache
+def circle_sprite(radius, color):
+    # shared by all particles of the same radius and color
+    image = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+    pygame.draw.circle(image, color, (radius, radius), radius)
+    return image
 
 
-class Bubble:
-    COLORS = [(250, 145, 137), (252, 174, 124), (255, 230, 153), (249, 255, 181), (179, 245, 188), (214, 246, 255), (226, 203, 247), (209, 189, 255)]
+class Dust:
+    FIELDS = ("x", "y", "ttl", "radius", "image")
 
     def __init__(self, pos):
-        self.pos = list(pos)
-        self.speed = random.random() * 5 + 2
-        self.angle = random.random() * (math.pi * 2)
-        self.ttl = random.randint(90, 120)
-        radius = int(random.random() * 4)
-        self.image = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, random.sample(Bubble.COLORS, 1)[0], (radius, radius), radius)
+        self.x, self.y = pos
+        self.ttl = rng.PARTICLES.randint(5, 15)
+        self.radius = int(rng.PARTICLES.random() * 6)
+        self.image = circle_sprite(self.radius, (192, 192, 192))
+
+    @staticmethod
+    def update_pool(pool):
+        pool["ttl"] = [ttl - 1 for ttl in pool["ttl"]]
+        pool.compact([ttl != 0 for ttl in pool["ttl"]])
+
+    @staticmethod
+    def render_pool(pool, surface: pygame.Surface, offset=(0, 0)):
+        surface.blits(
+            [(image, (x - offset[0], y - offset[1] - radius)) for x, y, radius, image in zip(pool["x"], pool["y"], pool["radius"], pool["image"])],
+            doreturn=False,
+        )
+        return len(pool)
 
-    def update(self):
-        self.ttl -= 1
-        if self.ttl <= 0:
-            return True
 
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+class Bubble:
+    COLORS = [(250, 145, 137), (252, 174, 124), (255, 230, 153), (249, 255, 181), (179, 245, 188), (214, 246, 255), (226, 203, 247), (209, 189, 255)]
+    FIELDS = ("x", "y", "vx", "vy", "ttl", "image")
 
-    def render(self, surface: pygame.Surface, offset=(0, 0)):
-        surface.blit(self.image, (self.pos[0] - offset[0], self.pos[1] - offset[1]))
+    def __init__(self, pos):
+        self.x, self.y = pos
+        speed = rng.PARTICLES.random() * 5 + 2
+        angle = rng.PARTICLES.random() * (math.pi * 2)
+        self.vx = math.cos(angle) * speed
+        self.vy = math.sin(angle) * speed
+        self.ttl = rng.PARTICLES.randint(90, 120)
+        radius = int(rng.PARTICLES.random() * 4)
+        self.image = circle_sprite(radius, rng.PARTICLES.sample(Bubble.COLORS, 1)[0])
+
+    @staticmethod
+    def update_pool(pool):
+        pool["ttl"] = [ttl - 1 for ttl in pool["ttl"]]
+        pool.compact([ttl > 0 for ttl in pool["ttl"]])
+        pool["x"] = [x + vx for x, vx in zip(pool["x"], pool["vx"])]
+        pool["y"] = [y + vy for y, vy in zip(pool["y"], pool["vy"])]
+
+    @staticmethod
+    def render_pool(pool, surface: pygame.Surface, offset=(0, 0)):
+        surface.blits([(image, (x - offset[0], y - offset[1])) for x, y, image in zip(pool["x"], pool["y"], pool["image"])], doreturn=False)
+        return len(pool)
 
 
 class Spark:
+    FIELDS = ("x", "y", "angle", "speed")
+
     def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
+        self.x, self.y = pos
         self.angle = angle
         self.speed = speed
 
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-
-    def render(self, surface, offset=(0, 0)):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (
-                self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0],
-                self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1],
-            ),
-            (
-                self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0],
-                self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1],
-            ),
-            (
-                self.pos[0] + math.cos(self.angle - math.pi) * self.speed * 0.5 - offset[0],
-                self.pos[1] + math.sin(self.angle - math.pi) * self.speed * 0.5 - offset[1],
-            ),
-        ]
-
-        pygame.draw.polygon(surface, (255, 255, 255), render_points)
+    @staticmethod
+    def update_pool(pool):
+        pool["x"] = [x + math.cos(angle) * speed for x, angle, speed in zip(pool["x"], pool["angle"], pool["speed"])]
+        pool["y"] = [y + math.sin(angle) * speed for y, angle, speed in zip(pool["y"], pool["angle"], pool["speed"])]
+        pool["speed"] = [max(0, speed - 0.1) for speed in pool["speed"]]
+        pool.compact(pool["speed"])
+
+    @staticmethod
+    def render_pool(pool, surface, offset=(0, 0)):
+        for x, y, angle, speed in zip(pool["x"], pool["y"], pool["angle"], pool["speed"]):
+            render_points = [
+                (x + math.cos(angle) * speed * 3 - offset[0], y + math.sin(angle) * speed * 3 - offset[1]),
+                (
+                    x + math.cos(angle + math.pi * 0.5) * speed * 0.5 - offset[0],
+                    y + math.sin(angle + math.pi * 0.5) * speed * 0.5 - offset[1],
+                ),
+                (
+                    x + math.cos(angle + math.pi) * speed * 3 - offset[0],
+                    y + math.sin(angle + math.pi) * speed * 3 - offset[1],
+                ),
+                (
+                    x + math.cos(angle - math.pi) * speed * 0.5 - offset[0],
+                    y + math.sin(angle - math.pi) * speed * 0.5 - offset[1],
+                ),
+            ]
+
+            pygame.draw.polygon(surface, (255, 255, 255), render_points)
+        # sparks are drawn, not blitted
+        return 0
 
 
 class Leaf:
+    # leaves play their animation on the shared clock, starting with frame 0 when spawned
+    FIELDS = ("x", "y", "phase", "ttl", "animation")
+
     def __init__(self, pos, animation: Animation):
-        self.pos = list(pos)
-        self.animation = animation.copy()
-        self.ttl = random.randint(120, 240)
+        self.x, self.y = pos
+        self.phase = -CLOCK.frame
+        self.ttl = rng.PARTICLES.randint(120, 240)
+        self.animation = animation
+
+    @staticmethod
+    def update_pool(pool):
+        pool["ttl"] = [ttl - 1 for ttl in pool["ttl"]]
+        pool.compact([ttl > 0 for ttl in pool["ttl"]])
+        pool["x"] = [
+            x + math.sin(((CLOCK.frame + phase) % (animation.image_duration * len(animation.images))) * 0.035) * 0.3
+            for x, phase, animation in zip(pool["x"], pool["phase"], pool["animation"])
+        ]
+        pool["y"] = [y + 0.3 for y in pool["y"]]
+
+    @staticmethod
+    def render_pool(pool, surface, offset=(0, 0)):
+        blits = []
+        for x, y, phase, animation in zip(pool["x"], pool["y"], pool["phase"], pool["animation"]):
+            img = animation.images[int(((CLOCK.frame + phase) % (animation.image_duration * len(animation.images))) / animation.image_duration)]
+            blits.append((img, (x - offset[0] - img.get_width() // 2, y - offset[1] - img.get_height() // 2)))
+        surface.blits(blits, doreturn=False)
+        return len(blits)
+
+
+class ParticlePool:
+    def __init__(self, kind):
+        self.kind = kind
+        self.fields = {field: [] for field in kind.FIELDS}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def __setitem__(self, field, values):
+        self.fields[field] = values
+
+    def __len__(self):
+        return len(self.fields[self.kind.FIELDS[0]])
+
+    def add(self, particle):
+        for field, values in self.fields.items():
+            values.append(getattr(particle, field))
+
+    def compact(self, alive):
+        # drops all dead particles at once instead of removing them one by one
+        if not all(alive):
+            for field, values in self.fields.items():
+                self.fields[field] = list(compress(values, alive))
 
     def update(self):
-        self.ttl -= 1
-        if self.ttl <= 0:
-            return True
-
-        self.pos[0] += math.sin(self.animation.frame * 0.035) * 0.3
-        self.pos[1] += 0.3
-
-        self.animation.update()
-
-    def render(self, surface, offset=(0, 0)):
-        img = self.animation.image()
-        surface.blit(
-            img,
-            (
-                self.pos[0] - offset[0] - img.get_width() // 2,
-                self.pos[1] - offset[1] - img.get_height() // 2,
-            ),
-        )
+        self.kind.update_pool(self)
+
+    def render(self, surface: pygame.Surface, offset=(0, 0)):
+        # returns the number of blits
+        return self.kind.render_pool(self, surface, offset)
 
 
 class Particles:
     def __init__(self):
-        self.particles = []
+        self.pools = {}
+        # number of blits of the last render call
+        self.blit_count = 0
+
+    def __len__(self):
+        return sum(len(pool) for pool in self.pools.values())
 
     def update(self):
-        for particle in self.particles.copy():
-            if particle.update():
-                self.particles.remove(particle)
+        for pool in self.pools.values():
+            if len(pool):
+                pool.update()
 
     def render(self, surface: pygame.Surface, offset=(0, 0)):
-        for particle in self.particles:
-            particle.render(surface, offset)
+        self.blit_count = 0
+        for pool in self.pools.values():
+            if len(pool):
+                self.blit_count += pool.render(surface, offset)
 
     def add(self, particle):
-        self.particles.append(particle)
+        if type(particle) not in self.pools:
+            self.pools[type(particle)] = ParticlePool(type(particle))
+        self.pools[type(particle)].add(particle)
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+from scripts.assets import LEAF_SPAWN_RECTS
+from scripts.tilemap import Tilemap
+
+SPAWNERS = [("spawners", 0), ("spawners", 1), ("spawners", 2), ("spawners", 3), ("spawners", 4), ("spawners", 5), ("spawners", 6)]
+TREES = [("decor/trees", 0), ("decor/trees", 1), ("decor/trees", 2), ("decor/trees", 3), ("decor/trees", 4), ("decor/trees", 5)]
+
+
+def prepare_level(path):
+    # everything about a level that does not depend on the game state (and may run on a worker thread);
+    # the tilemap gets no assets, so images are only ever loaded on the main thread
+    tilemap = Tilemap()
+    tilemap.load(path)
+    surface_tiles = tilemap.find_surface_tiles()
+    spawners = tilemap.extract(SPAWNERS)
+    leaf_spawners = []
+    for tree in tilemap.extract(TREES, keep=True):
+        leaf_spawners.append(
+            pygame.Rect(
+                tree["pos"][0] + LEAF_SPAWN_RECTS[tree["variant"]].x,
+                tree["pos"][1] + LEAF_SPAWN_RECTS[tree["variant"]].y,
+                LEAF_SPAWN_RECTS[tree["variant"]].width,
+                LEAF_SPAWN_RECTS[tree["variant"]].height,
+            )
+        )
+    return {"level": tilemap.level_data(), "surface_tiles": surface_tiles, "spawners": spawners, "leaf_spawners": leaf_spawners}
+
+
+class LevelPreloader:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-preloader")
+        self.pending = {}
+
+    def preload(self, path):
+        if path not in self.pending:
+            self.pending[path] = self.executor.submit(prepare_level, path)
+
+    def get(self, path):
+        # prepared levels are handed out once; preload the path again to get another copy
+        if path in self.pending:
+            return self.pending.pop(path).result()
+        return prepare_level(path)
@@ -0,0 +1,67 @@
+import os
+
+import pygame
+
+# "sdl2" presents frames through pygame's SDL2 renderer (the display is uploaded to a texture and scaled
+# by the GPU); the default "software" scales into the window surface
+RENDERER = os.environ.get("JNR_RENDERER", "software")
+
+
+class Presenter:
+    # copies the display surface to the window; all surfaces involved are only (re)allocated in resize
+    def __init__(self, caption, size, renderer=RENDERER):
+        self.window = None
+        self.renderer = None
+        if renderer == "sdl2":
+            try:
+                from pygame._sdl2 import video
+
+                self.window = video.Window(caption, size, resizable=True)
+                self.renderer = video.Renderer(self.window)
+                # images are converted to the format of the display module's window, so it needs one (kept hidden;
+                # closing the visible window then only sends WINDOWCLOSE, see the event loops)
+                pygame.display.set_mode((1, 1), pygame.HIDDEN)
+            except (ImportError, pygame.error):
+                # fall back to the software path
+                self.window = None
+                self.renderer = None
+        if self.renderer is None:
+            pygame.display.set_caption(caption)
+            pygame.display.set_mode(size, pygame.RESIZABLE)
+
+    def window_size(self):
+        if self.renderer is not None:
+            return self.window.size
+        return pygame.display.get_surface().get_size()
+
+    def resize(self, size, display_size):
+        # returns the new display surface (of display_size) which is scaled to fit the window of size
+        display_size = (int(display_size[0]), int(display_size[1]))
+        scale = display_size[1] / size[1]
+        self.target = pygame.Rect(0, 0, min(size[0], int(display_size[0] / scale)), min(size[1], int(display_size[1] / scale)))
+
+        if self.renderer is not None:
+            from pygame._sdl2 import video
+
+            self.texture = video.Texture(self.renderer, display_size, streaming=True)
+            return pygame.Surface(display_size)
+
+        # the display uses the pixel format of the window, so no conversion is needed when copying it
+        screen = pygame.display.get_surface()
+        screen.fill((0, 0, 0))
+        self.screen = screen.subsurface(self.target)
+        return pygame.Surface(display_size, 0, screen)
+
+    def present(self, display: pygame.Surface):
+        if self.renderer is not None:
+            self.texture.update(display)
+            self.renderer.clear()
+            self.texture.draw(dstrect=self.target)
+            self.renderer.present()
+            return
+
+        if display.get_size() == self.target.size:
+            self.screen.blit(display, (0, 0))
+        else:
+            pygame.transform.scale(display, self.target.size, self.screen)
+        pygame.display.update()
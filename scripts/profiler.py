@@ -0,0 +1,180 @@
+import cProfile
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+
+import pygame
+
+# stages of a frame in the order they are measured by Game.run and Game.render
+STAGES = [
+    "events",
+    "wait",
+    "update",
+    "background",
+    "tilemap",
+    "checkpoints",
+    "fruits",
+    "particles",
+    "projectiles",
+    "enemies",
+    "player",
+    "stats",
+    "transition",
+    "overlay",
+    "present",
+]
+# directory for flight recorder dumps and cProfile captures (the flight recorder is disabled if not set)
+RECORD_PATH = os.environ.get("JNR_FLIGHT_RECORDER")
+# frames taking longer than this (in milliseconds) are dumped together with the frames before them
+FRAME_BUDGET = float(os.environ.get("JNR_FRAME_BUDGET", 1000 / 30))
+# number of frames captured with cProfile (armed with F4 or right from the start if JNR_PROFILE_FRAMES is set)
+PROFILE_FRAMES = int(os.environ.get("JNR_PROFILE_FRAMES", 0)) or 120
+# frame time shown at the top of the graph (in seconds) and number of frames shown
+GRAPH_RANGE = 1 / 30
+GRAPH_WIDTH = 240
+# the overlay texts are refreshed every TEXT_INTERVAL frames
+TEXT_INTERVAL = 30
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Profiler:
+    # times the stages of every frame (a perf_counter call per stage) and keeps the last frames (all if None)
+    def __init__(self, font: pygame.Font, frames=240):
+        self.font = font
+        self.visible = False
+        self.frame_times = deque(maxlen=frames)
+        self.stage_times = {stage: deque(maxlen=frames) for stage in STAGES}
+        self.current = dict.fromkeys(STAGES, 0)
+        self.counts = {}
+        self.frame_start = self.last = time.perf_counter()
+        self.frame = 0
+        self.text = None
+        self.graph = pygame.Surface((GRAPH_WIDTH, 48), pygame.SRCALPHA)
+
+    def begin_frame(self):
+        self.current = dict.fromkeys(STAGES, 0)
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        # adds the time since the last mark to stage
+        now = time.perf_counter()
+        self.current[stage] += now - self.last
+        self.last = now
+
+    def end_frame(self, counts):
+        self.frame_times.append(self.last - self.frame_start)
+        for stage, seconds in self.current.items():
+            self.stage_times[stage].append(seconds)
+        self.counts = counts
+        self.frame += 1
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.text = None
+
+    def compose(self):
+        lines = [
+            f"frame {sum(self.frame_times) / len(self.frame_times) * 1000:5.2f} ms"
+            + f"  p95 {percentile(self.frame_times, 0.95) * 1000:5.2f}"
+            + f"  p99 {percentile(self.frame_times, 0.99) * 1000:5.2f}",
+            f"{'stage (ms)':<12}{'avg':>6}{'p99':>7}",
+        ]
+        for stage, times in self.stage_times.items():
+            lines.append(f"{stage:<12}{sum(times) / len(times) * 1000:6.2f}{percentile(times, 0.99) * 1000:7.2f}")
+        lines.append(" ".join(f"{name} {count}" for name, count in self.counts.items()))
+
+        surfaces = [self.font.render(line, False, (255, 255, 255)) for line in lines]
+        text = pygame.Surface((max(self.graph.get_width(), max(s.get_width() for s in surfaces)) + 8, len(surfaces) * 10 + 6), pygame.SRCALPHA)
+        text.fill((0, 0, 0, 160))
+        for i, surface in enumerate(surfaces):
+            text.blit(surface, (4, 4 + i * 10))
+        return text
+
+    def render(self, surface: pygame.Surface):
+        if not self.visible or not self.frame_times:
+            return
+        if self.text is None or self.frame % TEXT_INTERVAL == 0:
+            self.text = self.compose()
+
+        # frame time graph (newest frame on the right) with a line at the simulation step budget
+        height = self.graph.get_height()
+        self.graph.fill((0, 0, 0, 160))
+        pygame.draw.line(self.graph, (255, 255, 0), (0, height // 2), (self.graph.get_width(), height // 2))
+        frame_times = list(islice(self.frame_times, max(0, len(self.frame_times) - GRAPH_WIDTH), None))
+        if len(frame_times) > 1:
+            x = GRAPH_WIDTH - len(frame_times)
+            pygame.draw.lines(
+                self.graph,
+                (0, 255, 0),
+                False,
+                [(x + i, height - 1 - min(height - 1, seconds / GRAPH_RANGE * height)) for i, seconds in enumerate(frame_times)],
+            )
+
+        bottom = surface.get_height() - 7
+        surface.blit(self.graph, (7, bottom - height))
+        surface.blit(self.text, (7, bottom - height - self.text.get_height()))
+
+
+class FlightRecorder:
+    # keeps the stage timings and counts of the last frames and dumps them when a frame exceeds the budget
+    def __init__(self, path=RECORD_PATH, budget=FRAME_BUDGET, frames=240):
+        self.path = path
+        self.budget = budget / 1000
+        self.frames = deque(maxlen=frames)
+        self.last_dump = None
+        # frames over budget that are not dumped yet
+        self.spikes = []
+        self.profile = None
+        self.profile_start = 0
+        self.profile_frames = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+        if "JNR_PROFILE_FRAMES" in os.environ:
+            self.arm_profile()
+
+    def record(self, profiler: Profiler):
+        frame_time = profiler.frame_times[-1]
+        if self.path:
+            self.frames.append({"frame": profiler.frame, "time": frame_time, "stages": profiler.current, "counts": profiler.counts})
+            if frame_time > self.budget:
+                self.spikes.append(profiler.frame)
+            # dumps don't overlap: spikes shortly after a dump are dumped once the dumped frames have left the ring buffer
+            # (the new dump then holds all frames since the previous one)
+            if self.spikes and (self.last_dump is None or profiler.frame - self.last_dump >= self.frames.maxlen):
+                self.last_dump = profiler.frame
+                self.dump_spikes()
+
+        if self.profile:
+            self.profile_frames -= 1
+            if self.profile_frames <= 0:
+                self.profile.disable()
+                self.profile.dump_stats(os.path.join(self.path or ".", f"frames-{self.profile_start}-{profiler.frame}.pstats"))
+                self.profile = None
+
+    def close(self):
+        # dumps the spikes still waiting for the ring buffer to move on
+        if self.spikes:
+            self.dump_spikes()
+
+    def dump_spikes(self):
+        self.dump(os.path.join(self.path, f"spike-{time.strftime('%Y%m%d-%H%M%S')}-{self.spikes[0]}.json"))
+        self.spikes = []
+
+    def dump(self, path):
+        f = open(path, "w")
+        json.dump({"budget": self.budget, "spikes": self.spikes, "frames": list(self.frames)}, f)
+        f.close()
+
+    def arm_profile(self, frames=PROFILE_FRAMES, start=0):
+        # profiles the next frames (ignored while a capture is running)
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile_start = start
+            self.profile_frames = frames
+            self.profile.enable()
@@ -1,6 +1,7 @@
 import math
-import random
 
+import pygame
+from scripts import rng
 from scripts.particles import Spark
 
 
@@ -9,37 +10,42 @@ class Projectile:
         self.game = game
         self.type = p_type
         self.pos = list(pos)
+        self.last_pos = list(pos)
         self.velocity = list(velocity)
         self.timer = timer
         self.image = game.projectile_assets[p_type]
 
     def update(self, tilemap):
         self.timer -= 1
+        self.last_pos = self.pos.copy()
         self.pos[0] += self.velocity[0]
         self.pos[1] += self.velocity[1]
 
         if tilemap.solid_check(self.pos):
             for i in range(8):
                 if self.velocity[0] > 0:
-                    self.game.particles.add(Spark(self.pos, random.random() - 0.5 + math.pi, 2 + random.random()))
+                    self.game.particles.add(Spark(self.pos, rng.PARTICLES.random() - 0.5 + math.pi, 2 + rng.PARTICLES.random()))
                 if self.velocity[0] < 0:
-                    self.game.particles.add(Spark(self.pos, random.random() - 0.5, 2 + random.random()))
+                    self.game.particles.add(Spark(self.pos, rng.PARTICLES.random() - 0.5, 2 + rng.PARTICLES.random()))
                 if self.velocity[1] > 0:
-                    self.game.particles.add(Spark(self.pos, random.random() - 0.5 - math.pi / 2, 2 + random.random()))
+                    self.game.particles.add(Spark(self.pos, rng.PARTICLES.random() - 0.5 - math.pi / 2, 2 + rng.PARTICLES.random()))
                 if self.velocity[1] < 0:
-                    self.game.particles.add(Spark(self.pos, random.random() - 0.5 + math.pi / 2, 2 + random.random()))
+                    self.game.particles.add(Spark(self.pos, rng.PARTICLES.random() - 0.5 + math.pi / 2, 2 + rng.PARTICLES.random()))
             return True
         elif self.timer <= 0:
             return True
-        elif self.game.player.rect().collidepoint(self.pos):
-            self.game.player.die()
-            return True
 
-    def render(self, surface, offset=(0, 0)):
+    def rect(self):
+        return pygame.Rect(self.pos[0], self.pos[1], 1, 1)
+
+    def render(self, surface, offset=(0, 0), alpha=1):
+        pos = (self.last_pos[0] + (self.pos[0] - self.last_pos[0]) * alpha, self.last_pos[1] + (self.pos[1] - self.last_pos[1]) * alpha)
         surface.blit(
             self.image,
             (
-                self.pos[0] - self.image.get_width() / 2 - offset[0],
-                self.pos[1] - self.image.get_height() / 2 - offset[1],
+                pos[0] - self.image.get_width() / 2 - offset[0],
+                pos[1] - self.image.get_height() / 2 - offset[1],
             ),
         )
+        # number of blits onto surface
+        return 1
@@ -0,0 +1,24 @@
+import os
+import random
+
+# every subsystem draws from its own random stream, so that e.g. spawning more particles doesn't change
+# the behavior of the enemies in a seeded run; the streams are unseeded unless seed is called
+SEED = int(os.environ["JNR_SEED"]) if "JNR_SEED" in os.environ else None
+
+FRUITS = random.Random()
+CLOUDS = random.Random()
+ENEMIES = random.Random()
+PARTICLES = random.Random()
+LEAFS = random.Random()
+
+STREAMS = {"fruits": FRUITS, "clouds": CLOUDS, "enemies": ENEMIES, "particles": PARTICLES, "leafs": LEAFS}
+
+
+def new_seed():
+    return random.getrandbits(63)
+
+
+def seed(value):
+    # each stream gets a seed of its own, derived from value and the stream name
+    for name, stream in STREAMS.items():
+        stream.seed(f"{value}:{name}")
@@ -0,0 +1,55 @@
+import pygame
+
+
+class SpatialHash:
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.items = {}
+        self.count = 0
+
+    def clear(self):
+        self.cells = {}
+        self.items = {}
+
+    def cells_in(self, rect):
+        for x in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1):
+            for y in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1):
+                yield (x, y)
+
+    def insert(self, item, rect):
+        # items are tracked by identity, so unhashable objects (like tile dicts) can be stored, too
+        self.remove(item)
+        rect = pygame.Rect(rect)
+        self.count += 1
+        self.items[id(item)] = (self.count, item, rect)
+        for cell in self.cells_in(rect):
+            self.cells.setdefault(cell, []).append(id(item))
+
+    def remove(self, item):
+        entry = self.items.pop(id(item), None)
+        if entry:
+            for cell in self.cells_in(entry[2]):
+                self.cells[cell].remove(id(item))
+                if not self.cells[cell]:
+                    del self.cells[cell]
+
+    def query(self, rect):
+        # matches are returned in insertion order
+        rect = pygame.Rect(rect)
+        matches = {}
+        for cell in self.cells_in(rect):
+            for item_id in self.cells.get(cell, ()):
+                entry = self.items[item_id]
+                if item_id not in matches and entry[2].colliderect(rect):
+                    matches[item_id] = entry
+        return [entry[1] for entry in sorted(matches.values(), key=lambda entry: entry[0])]
+
+    def query_point(self, pos):
+        cell = (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+        matches = []
+        for item_id in self.cells.get(cell, ()):
+            entry = self.items[item_id]
+            if entry[2].collidepoint(pos):
+                matches.append(entry)
+        return [entry[1] for entry in sorted(matches, key=lambda entry: entry[0])]
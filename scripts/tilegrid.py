@@ -0,0 +1,169 @@
+MAX_DENSE_CELLS = 1 << 20
+
+# surface materials of solid tiles (0 = not solid)
+SOLID = 1
+ICE = 2
+SWAMP = 3
+MATERIALS = {"tiles/ice": ICE, "tiles/swamp": SWAMP}
+
+
+def tile_material(t_type):
+    if t_type.startswith("tiles"):
+        return MATERIALS.get(t_type, SOLID)
+    return 0
+
+
+class TileGrid:
+    def __init__(self):
+        # type ids index into self.types; id 0 marks empty cells
+        self.types = [None]
+        self.type_ids = {}
+        self.materials = [0]
+
+        # dense storage for the level's bounding box (one byte per cell each for type id, variant and material)
+        self.x = 0
+        self.y = 0
+        self.width = 0
+        self.height = 0
+        self.type_grid = bytearray()
+        self.variant_grid = bytearray()
+        self.material_grid = bytearray()
+
+        # sparse fallback for cells outside of the dense area: (x, y) -> (type id, variant)
+        self.sparse = {}
+
+    @staticmethod
+    def from_dict(tiles):
+        grid = TileGrid()
+        if tiles:
+            x0 = min(tile["pos"][0] for tile in tiles.values())
+            y0 = min(tile["pos"][1] for tile in tiles.values())
+            x1 = max(tile["pos"][0] for tile in tiles.values())
+            y1 = max(tile["pos"][1] for tile in tiles.values())
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_DENSE_CELLS:
+                grid.allocate(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+        for tile in tiles.values():
+            grid.set(tile["pos"][0], tile["pos"][1], tile["type"], tile["variant"])
+        return grid
+
+    def to_dict(self):
+        tiles = {}
+        for x, y, t_type, variant in self:
+            tiles[str(x) + ";" + str(y)] = {"type": t_type, "variant": variant, "pos": [x, y]}
+        return tiles
+
+    def allocate(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.type_grid = bytearray(width * height)
+        self.variant_grid = bytearray(width * height)
+        self.material_grid = bytearray(width * height)
+
+    def type_id(self, t_type):
+        if t_type not in self.type_ids:
+            if len(self.types) > 255:
+                raise ValueError("too many tile types: " + str(t_type))
+            self.type_ids[t_type] = len(self.types)
+            self.types.append(t_type)
+            self.materials.append(tile_material(t_type))
+        return self.type_ids[t_type]
+
+    def index(self, x, y):
+        x -= self.x
+        y -= self.y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return -1
+
+    def get(self, x, y):
+        i = self.index(x, y)
+        if i >= 0:
+            if self.type_grid[i]:
+                return self.type_grid[i], self.variant_grid[i]
+            return None
+        return self.sparse.get((x, y))
+
+    def get_type(self, x, y):
+        i = self.index(x, y)
+        if i >= 0:
+            return self.types[self.type_grid[i]]
+        if (x, y) in self.sparse:
+            return self.types[self.sparse[(x, y)][0]]
+
+    def material(self, x, y):
+        i = self.index(x, y)
+        if i >= 0:
+            return self.material_grid[i]
+        if (x, y) in self.sparse:
+            return self.materials[self.sparse[(x, y)][0]]
+        return 0
+
+    def set(self, x, y, t_type, variant):
+        i = self.index(x, y)
+        if i >= 0:
+            self.type_grid[i] = self.type_id(t_type)
+            self.variant_grid[i] = variant
+            self.material_grid[i] = self.materials[self.type_grid[i]]
+        else:
+            self.sparse[(x, y)] = (self.type_id(t_type), variant)
+
+    def set_variant(self, x, y, variant):
+        i = self.index(x, y)
+        if i >= 0:
+            self.variant_grid[i] = variant
+        elif (x, y) in self.sparse:
+            self.sparse[(x, y)] = (self.sparse[(x, y)][0], variant)
+
+    def neighbor_masks(self, type_id):
+        # one byte per cell of the dense area with bit 0 / 1 / 2 / 3 set if its right / left / lower / upper
+        # neighbor has type_id; all cells are handled at once by shifting the grid as one big integer
+        # (a cell is one byte, the first cell being the most significant one)
+        size = len(self.type_grid)
+        if not size:
+            return bytes()
+        table = bytearray(256)
+        table[type_id] = 1
+        cells = int.from_bytes(self.type_grid.translate(table), "big")
+        has_right = int.from_bytes((b"\x01" * (self.width - 1) + b"\x00") * self.height, "big")
+        has_left = int.from_bytes((b"\x00" + b"\x01" * (self.width - 1)) * self.height, "big")
+        right = (cells << 8) & has_right
+        left = (cells >> 8) & has_left
+        below = (cells << 8 * self.width) & ((1 << 8 * size) - 1)
+        above = cells >> 8 * self.width
+        return (right | left << 1 | below << 2 | above << 3).to_bytes(size, "big")
+
+    def set_variants(self, type_id, variants):
+        # sets the variants of all cells of the dense area with type_id (variants has one byte per cell)
+        if not self.type_grid:
+            return
+        table = bytearray(256)
+        table[type_id] = 0xFF
+        selected = int.from_bytes(self.type_grid.translate(table), "big")
+        current = int.from_bytes(self.variant_grid, "big")
+        self.variant_grid[:] = ((current & ~selected) | (int.from_bytes(variants, "big") & selected)).to_bytes(len(self.variant_grid), "big")
+
+    def delete(self, x, y):
+        i = self.index(x, y)
+        if i >= 0:
+            deleted = self.type_grid[i] != 0
+            self.type_grid[i] = 0
+            self.variant_grid[i] = 0
+            self.material_grid[i] = 0
+            return deleted
+        return self.sparse.pop((x, y), None) is not None
+
+    def __contains__(self, pos):
+        return self.get(pos[0], pos[1]) is not None
+
+    def __len__(self):
+        return len(self.type_grid) - self.type_grid.count(0) + len(self.sparse)
+
+    def __iter__(self):
+        # yields (x, y, type, variant) for every tile; the grid may be changed while iterating
+        for i, type_id in enumerate(self.type_grid):
+            if type_id:
+                yield self.x + i % self.width, self.y + i // self.width, self.types[type_id], self.variant_grid[i]
+        for (x, y), (type_id, variant) in list(self.sparse.items()):
+            yield x, y, self.types[type_id], variant
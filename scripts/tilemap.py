@@ -1,7 +1,9 @@
-import json
-
 import pygame
 
+from scripts.levelfile import preferred_path, read_level, write_level
+from scripts.spatial import SpatialHash
+from scripts.tilegrid import TileGrid, tile_material
+
 AUTOTILE_MAP = {
     # tiles are created in a 4x4 grid;
     # numbering is done from 00 (top left) to 15 (bottom right)
@@ -38,6 +40,13 @@ AUTOTILE_MAP = {
     tuple(): 15,
 }
 
+# neighbors of the same type that make up the autotile masks: bit 0 = right, 1 = left, 2 = below, 3 = above
+AUTOTILE_NEIGHBORS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+# variant by mask (AUTOTILE_MAP covers all 16 masks), padded to a bytes.translate table
+AUTOTILE_VARIANTS = bytes(
+    [AUTOTILE_MAP[tuple(sorted(shift for bit, shift in enumerate(AUTOTILE_NEIGHBORS) if mask & 1 << bit))] for mask in range(16)] + [0] * 240
+)
+
 NEIGHBOR_OFFSETS = [
     (-1, 0),
     (-1, -1),
@@ -50,86 +59,126 @@ NEIGHBOR_OFFSETS = [
     (1, 1),
 ]
 
+# ongrid tiles are prerendered in square chunks of CHUNK_SIZE x CHUNK_SIZE tiles
+CHUNK_SIZE = 16
+
 
 class Tilemap:
     def __init__(self, assets={}):
         self.assets = assets
         self.background = 0
         self.tile_size = 16
-        self.tiles = {}
+        self.tiles = TileGrid()
         self.offgrid = []
+        self.offgrid_index = SpatialHash()
+        self.chunks = {}
+        # retile the neighborhood of ongrid tiles when they are added or removed
+        self.auto_tile = False
+        # number of blits of the last render call
+        self.blit_count = 0
 
     def load(self, path):
-        f = open(path, "r")
-        data = json.load(f)
-        f.close()
+        self.load_data(read_level(preferred_path(path)))
+
+    def load_data(self, data):
         self.tile_size = data["tile_size"]
         self.tiles = data["tiles"]
         self.offgrid = data["offgrid"]
         self.background = data["background"]
+        self.chunks = {}
+        self.offgrid_index.clear()
+        for tile in self.offgrid:
+            self.offgrid_index.insert(tile, self.offgrid_rect(tile))
+
+    def level_data(self):
+        return {"background": self.background, "tile_size": self.tile_size, "tiles": self.tiles, "offgrid": self.offgrid}
 
     def save(self, path):
-        f = open(path, "w")
-        json.dump({"background": self.background, "tile_size": self.tile_size, "tiles": self.tiles, "offgrid": self.offgrid}, f)
-        f.close()
+        write_level(path, self.level_data())
 
     def add(self, pos, t_type, variant, ongrid=True):
         if t_type == "backgrounds":
             self.background = variant
         elif ongrid:
             pos = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-            self.tiles[str(pos[0]) + ";" + str(pos[1])] = {"type": t_type, "variant": variant, "pos": pos}
+            self.tiles.set(pos[0], pos[1], t_type, variant)
+            self.invalidate_chunk(pos)
+            if self.auto_tile:
+                self.autotile_around(pos)
         else:
             self.offgrid.append({"type": t_type, "variant": variant, "pos": pos})
+            self.offgrid_index.insert(self.offgrid[-1], self.offgrid_rect(self.offgrid[-1]))
 
     def remove(self, pos=(0, 0), offset=(0, 0), ongrid=True):
         if ongrid:
-            tile_loc = str(int(pos[0] // self.tile_size)) + ";" + str(int(pos[1] // self.tile_size))
-            if tile_loc in self.tiles:
-                del self.tiles[tile_loc]
+            tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+            if self.tiles.delete(tile_loc[0], tile_loc[1]):
+                self.invalidate_chunk(tile_loc)
+                if self.auto_tile:
+                    self.autotile_around(tile_loc)
         else:
-            for tile in self.offgrid.copy():
-                tile_img = self.assets[tile["type"]][tile["variant"]]
-                tile_rect = pygame.Rect(
-                    tile["pos"][0],
-                    tile["pos"][1],
-                    tile_img.get_width(),
-                    tile_img.get_height(),
-                )
-                if tile_rect.collidepoint(pos):
-                    self.offgrid.remove(tile)
+            for tile in self.offgrid_index.query_point(pos):
+                self.offgrid_index.remove(tile)
+                self.offgrid.remove(tile)
+
+    def offgrid_rect(self, tile):
+        # tilemaps without assets (e.g. in tools) fall back to tile sized rects
+        if not self.assets:
+            return pygame.Rect(tile["pos"][0], tile["pos"][1], self.tile_size, self.tile_size)
+        tile_img = self.assets[tile["type"]][tile["variant"]]
+        return pygame.Rect(
+            tile["pos"][0],
+            tile["pos"][1],
+            tile_img.get_width(),
+            tile_img.get_height(),
+        )
 
     def autotile(self):
-        for loc in self.tiles:
-            tile = self.tiles[loc]
-            if str(tile["type"]).startswith("tiles/"):
-                neighbors = set()
-                for shift in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-                    check_loc = str(tile["pos"][0] + shift[0]) + ";" + str(tile["pos"][1] + shift[1])
-                    if check_loc in self.tiles:
-                        if self.tiles[check_loc]["type"] == tile["type"]:
-                            neighbors.add(shift)
-                neighbors = tuple(sorted(neighbors))
-                if neighbors in AUTOTILE_MAP:
-                    tile["variant"] = AUTOTILE_MAP[neighbors]
+        # the dense area is retiled one tile type at a time (see TileGrid.neighbor_masks)
+        for type_id, t_type in enumerate(self.tiles.types):
+            if str(t_type).startswith("tiles/"):
+                self.tiles.set_variants(type_id, self.tiles.neighbor_masks(type_id).translate(AUTOTILE_VARIANTS))
+        # tiles outside of it (and their neighbors on its border) one by one
+        for x, y in list(self.tiles.sparse):
+            for shift in [(0, 0)] + AUTOTILE_NEIGHBORS:
+                self.autotile_tile(x + shift[0], y + shift[1])
+        self.chunks = {}
+
+    def autotile_tile(self, x, y):
+        t_type = self.tiles.get_type(x, y)
+        if str(t_type).startswith("tiles/"):
+            mask = 0
+            for bit, shift in enumerate(AUTOTILE_NEIGHBORS):
+                if self.tiles.get_type(x + shift[0], y + shift[1]) == t_type:
+                    mask |= 1 << bit
+            self.tiles.set_variant(x, y, AUTOTILE_VARIANTS[mask])
+
+    def autotile_around(self, tile_pos):
+        # retiles the 3x3 tiles around tile_pos (after it has been changed)
+        for x in range(tile_pos[0] - 1, tile_pos[0] + 2):
+            for y in range(tile_pos[1] - 1, tile_pos[1] + 2):
+                self.autotile_tile(x, y)
+                self.invalidate_chunk((x, y))
 
     def tiles_around(self, pos):
         tiles = []
         tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ";" + str(tile_loc[1] + offset[1])
-            if check_loc in self.tiles:
-                tiles.append(self.tiles[check_loc])
+            check_loc = (tile_loc[0] + offset[0], tile_loc[1] + offset[1])
+            tile = self.tiles.get(check_loc[0], check_loc[1])
+            if tile:
+                tiles.append({"type": self.tiles.types[tile[0]], "variant": tile[1], "pos": list(check_loc)})
         return tiles
 
     def physics_rects_around(self, pos):
         rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"].startswith("tiles/"):
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        for offset in NEIGHBOR_OFFSETS:
+            if self.tiles.material(tile_loc[0] + offset[0], tile_loc[1] + offset[1]):
                 rects.append(
                     pygame.Rect(
-                        tile["pos"][0] * self.tile_size,
-                        tile["pos"][1] * self.tile_size,
+                        (tile_loc[0] + offset[0]) * self.tile_size,
+                        (tile_loc[1] + offset[1]) * self.tile_size,
                         self.tile_size,
                         self.tile_size,
                     )
@@ -137,17 +186,25 @@ class Tilemap:
         return rects
 
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ";" + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tiles:
-            if self.tiles[tile_loc]["type"].startswith("tiles"):
-                return self.tiles[tile_loc]
+        # returns the material of the solid tile at pos (0 if there is none)
+        return self.tiles.material(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+
+    def raycast(self, start, end, samples):
+        # checks samples points on the line from start towards end; returns the first solid one (or None)
+        step = ((end[0] - start[0]) / samples, (end[1] - start[1]) / samples)
+        for i in range(samples):
+            pos = (start[0] + i * step[0], start[1] + i * step[1])
+            if self.tiles.material(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)):
+                return pos
+
+    def line_of_sight(self, start, end, samples):
+        return self.raycast(start, end, samples) is None
 
     def find_surface_tiles(self):
         pos = []
-        for tile_loc in self.tiles:
-            tile = self.tiles[tile_loc]
-            if tile["type"].startswith("tiles") and tile["variant"] in (0, 1, 2, 3, 12, 13, 14, 15):
-                above = (tile["pos"][0], tile["pos"][1] - 1)
+        for x, y, t_type, variant in self.tiles:
+            if tile_material(t_type) and variant in (0, 1, 2, 3, 12, 13, 14, 15):
+                above = (x, y - 1)
                 if not self.solid_check((above[0] * self.tile_size, above[1] * self.tile_size)):
                     pos.append(above)
         return pos
@@ -158,43 +215,67 @@ class Tilemap:
             if (tile["type"], tile["variant"]) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
+                    self.offgrid_index.remove(tile)
                     self.offgrid.remove(tile)
 
-        for loc in self.tiles.copy():
-            tile = self.tiles[loc]
-            if (tile["type"], tile["variant"]) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]["pos"] = matches[-1]["pos"].copy()
-                matches[-1]["pos"][0] *= self.tile_size
-                matches[-1]["pos"][1] *= self.tile_size
+        for x, y, t_type, variant in self.tiles:
+            if (t_type, variant) in id_pairs:
+                matches.append({"type": t_type, "variant": variant, "pos": [x * self.tile_size, y * self.tile_size]})
                 if not keep:
-                    del self.tiles[loc]
+                    self.invalidate_chunk((x, y))
+                    self.tiles.delete(x, y)
 
         return matches
 
+    def invalidate_chunk(self, tile_pos):
+        self.chunks.pop((tile_pos[0] // CHUNK_SIZE, tile_pos[1] // CHUNK_SIZE), None)
+
+    def chunk(self, chunk_loc):
+        # chunks are baked on first use and kept until a tile inside them changes
+        if chunk_loc not in self.chunks:
+            self.chunks[chunk_loc] = self.bake_chunk(chunk_loc)
+        return self.chunks[chunk_loc]
+
+    def bake_chunk(self, chunk_loc):
+        tiles = []
+        size = [0, 0]
+        for x in range(chunk_loc[0] * CHUNK_SIZE, (chunk_loc[0] + 1) * CHUNK_SIZE):
+            for y in range(chunk_loc[1] * CHUNK_SIZE, (chunk_loc[1] + 1) * CHUNK_SIZE):
+                tile = self.tiles.get(x, y)
+                if tile:
+                    img = self.assets[self.tiles.types[tile[0]]][tile[1]]
+                    dest = ((x - chunk_loc[0] * CHUNK_SIZE) * self.tile_size, (y - chunk_loc[1] * CHUNK_SIZE) * self.tile_size)
+                    tiles.append((img, dest))
+                    # images bigger than a tile may reach beyond the chunk borders
+                    size = [max(size[0], dest[0] + img.get_width()), max(size[1], dest[1] + img.get_height())]
+
+        if not tiles:
+            return None
+        chunk_surface = pygame.Surface(size, pygame.SRCALPHA)
+        chunk_surface.blits(tiles, doreturn=False)
+        return chunk_surface
+
     def render(self, surface: pygame.Surface, offset=(0, 0)):
-        for tile in self.offgrid:
+        # only render visible offgrid tiles
+        visible = self.offgrid_index.query((offset[0], offset[1], surface.get_width(), surface.get_height()))
+        self.blit_count = len(visible)
+        for tile in visible:
             surface.blit(
                 self.assets[tile["type"]][tile["variant"]],
                 (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
             )
 
-        # only render visible ongrid tiles
-        for x in range(
-            offset[0] // self.tile_size,
-            (offset[0] + surface.get_width()) // self.tile_size + 1,
+        # only render visible chunks (starting one chunk early for tiles reaching into the viewport)
+        chunk_width = CHUNK_SIZE * self.tile_size
+        for cx in range(
+            offset[0] // chunk_width - 1,
+            (offset[0] + surface.get_width()) // chunk_width + 1,
         ):
-            for y in range(
-                offset[1] // self.tile_size,
-                (offset[1] + surface.get_height()) // self.tile_size + 1,
+            for cy in range(
+                offset[1] // chunk_width - 1,
+                (offset[1] + surface.get_height()) // chunk_width + 1,
             ):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tiles:
-                    tile = self.tiles[loc]
-                    surface.blit(
-                        self.assets[tile["type"]][tile["variant"]],
-                        (
-                            tile["pos"][0] * self.tile_size - offset[0],
-                            tile["pos"][1] * self.tile_size - offset[1],
-                        ),
-                    )
+                chunk_surface = self.chunk((cx, cy))
+                if chunk_surface is not None:
+                    surface.blit(chunk_surface, (cx * chunk_width - offset[0], cy * chunk_width - offset[1]))
+                    self.blit_count += 1
@@ -0,0 +1,28 @@
+import pygame
+
+
+class IrisWipe:
+    def __init__(self):
+        self.surface = pygame.Surface((0, 0))
+        self.radius = None
+
+    def resize(self, size):
+        # the wipe surface is reused for every frame and only reallocated for new display sizes
+        self.surface = pygame.Surface(size)
+        self.surface.set_colorkey((255, 255, 255))
+        self.radius = None
+
+    def render(self, surface: pygame.Surface, radius):
+        # returns the number of blits onto surface (a full wipe is a fill)
+        if radius <= 0:
+            surface.fill((0, 0, 0))
+            return 0
+
+        if self.surface.get_size() != surface.get_size():
+            self.resize(surface.get_size())
+        if self.radius != radius:
+            self.radius = radius
+            self.surface.fill((0, 0, 0))
+            pygame.draw.circle(self.surface, (255, 255, 255), (surface.get_width() // 2, surface.get_height() // 2), radius)
+        surface.blit(self.surface, (0, 0))
+        return 1